@@ -0,0 +1,140 @@
+"""runs the grade calculations over a directory of transcript files (CSV or binary), without the GUI
+
+usage: python batch.py DIRECTORY POINTS [--out DIRECTORY] [--workers N] [--options N] [--cache DIRECTORY]
+                       [--plots FORMAT [FORMAT ...]] [--sweep] [--at-least | --tolerance POINTS] [--profile FILE]
+"""
+import argparse
+import csv
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
+from itertools import repeat
+
+import profiling
+from courses import MATCH_AT_LEAST, MATCH_EXACT, MATCH_TOLERANCE, SAVED_OPTIONS, TRANSCRIPT_EXTENSIONS, load_courses, \
+    results_cache, write_best_options
+
+
+SUMMARY_FILE = 'summary.csv'
+SUMMARY_COLUMNS = ['name', 'courses', 'total points', 'without choice', 'average', 'sd', 'best average',
+                   'malformed lines', 'error']
+SWEEP_COLUMNS = ['points', 'best average', 'course ids']
+FILES_PER_TASK = 8  # transcripts sent to a worker process at once
+
+
+def process_transcript(filename: str, points: float, out_dir: str, options: int, cache_dir=None, plot_formats=(),
+                       sweep: bool = False, match: str = MATCH_EXACT, tolerance: float = 0):
+    """computes the characteristics and the best options of one transcript, writes the options to out_dir and
+    returns the row of the transcript in the summary. best options are cached on disk in cache_dir if given.
+    the plots of the transcript are rendered to out_dir in each of plot_formats. with sweep, the best average of
+    every amount of choice points is written to out_dir too. the points of the options match `points` as in
+    Courses.set_final_points_amount"""
+    results_cache.directory = cache_dir
+    courses, errors = load_courses(filename)
+    courses.set_final_points_amount(points, match, tolerance)
+    name = os.path.splitext(os.path.basename(filename))[0]
+    best = courses.best_avg(options) or []
+    with open(os.path.join(out_dir, f'{name}_best_options.txt'), 'w') as file:
+        write_best_options(courses, best, file)
+    if sweep:
+        with open(os.path.join(out_dir, f'{name}_sweep.csv'), 'w', newline='') as file:
+            writer = csv.writer(file)
+            writer.writerow(SWEEP_COLUMNS)
+            try:
+                writer.writerows([amount, avg, ' '.join(ids)] for amount, avg, ids in courses.best_avg_sweep())
+            except ValueError:  # too many choice points to sweep, only the header is written
+                pass
+    if plot_formats:
+        from plots import render_plots  # matplotlib is only loaded when plotting
+        render_plots(courses, os.path.join(out_dir, name), plot_formats)
+    best_average = round(best[0][1], 3) if best else ''
+    return [name, len(courses.courses), courses.total_points, courses.non_choice_courses, courses.get_avg(),
+            courses.get_sd(), best_average, ' '.join(str(line) for line, _ in errors), '']
+
+
+def summary_row(filename: str, *args):
+    """runs process_transcript, and returns a summary row with only the name and the error of the transcript if it
+    fails, so one bad file doesn't stop the run"""
+    try:
+        return process_transcript(filename, *args)
+    except Exception as error:
+        name = os.path.splitext(os.path.basename(filename))[0]
+        return [name] + [''] * (len(SUMMARY_COLUMNS) - 2) + [f'{type(error).__name__}: {error}']
+
+
+def profiled_transcript(*args):
+    """runs summary_row in a worker process and returns its row with the timers and the counters gathered in the
+    worker, to be merged into the report of the main process"""
+    return summary_row(*args), profiling.take()
+
+
+def run(directory: str, points: float, out_dir: str, workers=None, options: int = SAVED_OPTIONS, cache_dir=None,
+        plot_formats=(), sweep: bool = False, match: str = MATCH_EXACT, tolerance: float = 0):
+    """processes every transcript file in the directory over a pool of worker processes, writing a best options file per
+    transcript and a summary of all of them to out_dir. a transcript that fails gets its error in the summary and
+    the others go on. returns the amount of files, the amount of courses and the seconds it took. with workers=0 the
+    files are processed in this process"""
+    filenames = sorted(os.path.join(directory, name) for name in os.listdir(directory)
+                       if name.endswith(TRANSCRIPT_EXTENSIONS))
+    os.makedirs(out_dir, exist_ok=True)
+    start = time.perf_counter()
+    rows = 0
+    arguments = (filenames, repeat(points), repeat(out_dir), repeat(options), repeat(cache_dir), repeat(plot_formats),
+                 repeat(sweep), repeat(match), repeat(tolerance))
+    merged = profiling.enabled and profiling.profiler is None and workers != 0  # timers of the workers are merged
+    pool = ProcessPoolExecutor(workers, initializer=profiling.enable if merged else None) if workers != 0 else None
+    with pool or nullcontext(), open(os.path.join(out_dir, SUMMARY_FILE), 'w', newline='') as file:
+        writer = csv.writer(file)
+        writer.writerow(SUMMARY_COLUMNS)
+        if pool is None:
+            results = map(summary_row, *arguments)
+        else:
+            results = pool.map(profiled_transcript if merged else summary_row, *arguments,
+                               chunksize=FILES_PER_TASK)
+        for row in results:
+            if merged:
+                row, taken = row
+                profiling.merge(taken)
+            writer.writerow(row)
+            rows += row[1] or 0
+    return len(filenames), rows, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description='calculates the characteristics and the best averages of every '
+                                                 'transcript in a directory')
+    parser.add_argument('directory', help='directory of transcript files (CSV or binary)')
+    parser.add_argument('points', type=float, help='amount of choice points to reach')
+    parser.add_argument('--out', default='results', help='directory for the results (default: results)')
+    parser.add_argument('--workers', type=int,
+                        help='amount of worker processes, 0 to run in this process (default: one per core)')
+    parser.add_argument('--options', type=int, default=SAVED_OPTIONS,
+                        help=f'best combinations written per transcript (default: {SAVED_OPTIONS})')
+    parser.add_argument('--cache', help='directory that keeps the best combinations of unchanged transcripts')
+    parser.add_argument('--plots', nargs='+', default=(), choices=['png', 'svg'], metavar='FORMAT',
+                        help='also renders the plots of every transcript in these formats (png, svg)')
+    parser.add_argument('--sweep', action='store_true',
+                        help='also writes the best average of every amount of choice points of every transcript')
+    matching = parser.add_mutually_exclusive_group()
+    matching.add_argument('--at-least', action='store_true',
+                          help='matches the fewest choice points of at least POINTS instead of exactly POINTS')
+    matching.add_argument('--tolerance', type=float, default=0,
+                          help='matches POINTS give or take this many choice points')
+    parser.add_argument('--profile', help=f'writes the timers and the counters to this JSON file, or cProfile output '
+                                          f'if it ends with {profiling.PROFILE_EXTENSION} (best with --workers 0)')
+    args = parser.parse_args()
+    if args.profile:
+        profiling.enable(args.profile)
+    match = MATCH_AT_LEAST if args.at_least else MATCH_TOLERANCE if args.tolerance else MATCH_EXACT
+    files, rows, seconds = run(args.directory, args.points, args.out, args.workers, args.options, args.cache,
+                               args.plots, args.sweep, match, args.tolerance)
+    seconds = max(seconds, 1e-9)
+    print(f'{files} files, {rows} courses in {seconds:.2f}s '
+          f'({files / seconds:.1f} files/s, {rows / seconds:.0f} rows/s)')
+    if profiling.enabled and profiling.profiler is None:
+        profiling.print_report()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,570 @@
+"""benchmarks of the grade manipulations on synthetic transcripts
+
+usage: python benchmark.py                 prints every benchmark and checks the import budgets
+       python benchmark.py --suite [--save FILE] [--compare FILE] [--tolerance SHARE]
+                                           times the hot paths, saving them as a JSON baseline or failing if they are
+                                           slower than a baseline
+"""
+import argparse
+import gc
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from itertools import combinations
+
+import numpy as np
+
+from courses import Course, Courses, ColumnarCourses, CHOICE, MATCH_AT_LEAST, MATCH_TOLERANCE, SAVED_OPTIONS, \
+    convert_transcript, load_courses, results_cache, save_changes, save_courses, write_best_options
+
+
+CATEGORIES = ['mandatory', 'science', 'humanities']
+IMPORT_BUDGET_MS = {'courses': 250, 'batch': 300, 'grade_manipulator': 400}  # cold start budgets
+HEAVY_MODULES = ['matplotlib', 'tkinter']  # must not be imported by courses and batch
+POINTS = [1.0, 1.5, 2.0, 2.5, 3.0, 4.0, 5.0]
+SUITE_ROWS = 10000  # transcript size of the loading, churn and copy cases of the suite
+SUITE_CHOICE = [10, 15, 20, 25, 30]  # choice courses of the best average cases of the suite
+SUITE_REPEATS = 7  # the suite keeps the fastest of this many runs of every case
+TOLERANCE = 0.25  # a case is a regression if it is slower than the baseline by more than this share
+
+
+def synthetic_courses(n_choice: int, n_other: int = 20, pass_share: float = 0.1, seed: int = 0):
+    """creates a Courses object of random courses, n_choice of them in the choice category"""
+    rnd = random.Random(seed)
+    courses = Courses()
+    for i in range(n_choice + n_other):
+        category = CHOICE if i < n_choice else rnd.choice(CATEGORIES)
+        grade = 'pass' if rnd.random() < pass_share else float(rnd.randint(60, 100))
+        courses.add_course(Course(str(10000 + i), f'course {i}', rnd.choice(POINTS), grade, category))
+    return courses
+
+
+def tied_courses(n_choice: int, tied: int, grade: float, seed: int = 0):
+    """creates a Courses object of n_choice random choice courses, the first `tied` of them with the same grade and
+    the rest with lower grades, the worst case of a search that keeps expanding branches of equal bound"""
+    rnd = random.Random(seed)
+    courses = Courses()
+    for i in range(n_choice):
+        courses.add_course(Course(str(10000 + i), f'course {i}', rnd.choice(POINTS),
+                                  grade if i < tied else float(rnd.randint(60, int(grade) - 1)), CHOICE))
+    return courses
+
+
+def forced_courses(n_choice: int, points: list, forced_points: float, forced_grade: float, seed: int = 0):
+    """creates a Courses object of n_choice random choice courses worth some of the given points, plus one worth
+    forced_points with a low grade, which a target of an odd amount of points forces into every combination"""
+    rnd = random.Random(seed)
+    courses = Courses()
+    for i in range(n_choice):
+        courses.add_course(Course(str(10000 + i), f'course {i}', rnd.choice(points), float(rnd.randint(60, 100)),
+                                  CHOICE))
+    courses.add_course(Course(str(10000 + n_choice), 'forced course', forced_points, forced_grade, CHOICE))
+    return courses
+
+
+def generate_courses(size: int, choice_ratio: float = 0.3, pass_share: float = 0.1, category_count: int = 3,
+                     seed: int = 0):
+    """creates a Courses object of `size` random courses: a choice_ratio share of them in the choice category, the
+    rest spread over category_count other categories, and a pass_share share of them with a binary grade"""
+    rnd = random.Random(seed)
+    categories = [f'category {i}' for i in range(category_count)]
+    courses = Courses()
+    courses.add_courses(
+        Course(str(10000 + i), f'course {i}', rnd.choice(POINTS), 'pass' if rnd.random() < pass_share else
+               float(rnd.randint(60, 100)), CHOICE if rnd.random() < choice_ratio else rnd.choice(categories))
+        for i in range(size))
+    return courses
+
+
+def brute_force_best_avg(courses: Courses):
+    """the exhaustive search over all the combinations of choice courses, kept as a reference"""
+    results = []
+    ids = courses.choice_courses
+    target, tolerance = courses.final_points_amount, courses.points_tolerance
+    if courses.points_match == MATCH_AT_LEAST:
+        target = min((courses.sum_points(combo) for i in range(1, len(ids) + 1) for combo in combinations(ids, i)
+                      if courses.sum_points(combo) > target - 1e-9), default=None)
+        if target is None:
+            return results
+    for i in range(1, len(ids) + 1):
+        results.extend(
+                [(combo, courses.avg_calc(combo)) for combo in combinations(ids, i)
+                 if abs(courses.sum_points(combo) - target) < tolerance + 1e-9])
+    results.sort(key=lambda z: z[1])
+    return list(reversed(results))
+
+
+def same_results(first, second):
+    """checks that two ranked lists hold the same combinations with the same averages in the same order"""
+    if len(first) != len(second):
+        return False
+    if any(abs(a[1] - b[1]) > 1e-9 for a, b in zip(first, second)):
+        return False
+    return {frozenset(c): round(avg, 9) for c, avg in first} == {frozenset(c): round(avg, 9) for c, avg in second}
+
+
+def timed(function, *args):
+    """returns the result of the function and the seconds it took"""
+    start = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - start
+
+
+def bench_best_avg():
+    """compares best_avg to the brute force search, then times the best option on large transcripts. returns
+    whether best_avg gave the results of the brute force search"""
+    print('choice\ttarget\tresults\tbrute(s)\tbest_avg(s)\tspeedup\tsame')
+    all_same = True
+    for n in [10, 12, 14, 16, 18]:
+        courses = synthetic_courses(n, seed=n)
+        courses.set_final_points_amount(int(courses.sum_points(courses.choice_courses) / 2))
+        expected, brute_time = timed(brute_force_best_avg, courses)
+        results_cache.entries.clear()
+        results, fast_time = timed(courses.best_avg)
+        same = same_results(expected, results)
+        all_same &= same
+        print(f'{n}\t{courses.final_points_amount}\t{len(results)}\t{brute_time:.4f}\t\t{fast_time:.4f}\t\t'
+              f'{brute_time / fast_time:.1f}x\t{same}')
+    print('\nchoice\ttarget\ttop 1(s)\ttop 10(s)\tbest average')
+    for n in [25, 50, 100, 200, 400]:
+        courses = synthetic_courses(n, seed=n)
+        courses.set_final_points_amount(int(courses.sum_points(courses.choice_courses) / 3))
+        best, best_time = timed(courses.best_avg, 1)
+        _, top_time = timed(courses.best_avg, 10)
+        print(f'{n}\t{courses.final_points_amount}\t{best_time:.4f}\t\t{top_time:.4f}\t\t{best[0][1]:.3f}')
+    print('\nchoice\ttied\tgrade\ttarget\ttop 1(s)\ttop 10(s)')
+    for n, tied, grade, target in [(28, 28, 90.0, None), (40, 24, 100.0, 40)]:
+        courses = tied_courses(n, tied, grade, seed=n)
+        courses.set_final_points_amount(target or int(courses.sum_points(courses.choice_courses) / 2))
+        results_cache.entries.clear()
+        _, best_time = timed(courses.best_avg, 1)
+        _, top_time = timed(courses.best_avg, 10)
+        print(f'{n}\t{tied}\t{grade}\t{courses.final_points_amount}\t{best_time:.4f}\t\t{top_time:.4f}')
+    print('\nchoice\tpoints\tforced\ttarget\ttop 1(s)\ttop 10(s)')
+    for n, points, grade, target in [(100, [2.0], 60.0, 41.5), (200, [2.0], 60.0, 41.5),
+                                     (200, [2.0, 3.0, 4.0], 75.0, 20.5)]:
+        courses = forced_courses(n, points, 1.5, grade, seed=n)
+        courses.set_final_points_amount(target)
+        results_cache.entries.clear()
+        _, best_time = timed(courses.best_avg, 1)
+        _, top_time = timed(courses.best_avg, 10)
+        print(f'{n}\t{"/".join(f"{p:g}" for p in points)}\t{grade}\t{target}\t{best_time:.4f}\t\t{top_time:.4f}')
+    return all_same
+
+
+def bench_exhaustive():
+    """compares the full ranked list built by NumPy enumeration to the brute force and branch and bound searches.
+    returns whether both gave the results of the brute force search"""
+    print('\nchoice\tresults\tbrute(s)\tsearch(s)\tnumpy(s)\tspeedup\tsame')
+    all_same = True
+    for n in [16, 20, 22]:
+        courses = synthetic_courses(n, seed=n)
+        courses.set_final_points_amount(int(courses.sum_points(courses.choice_courses) / 2))
+        expected, brute_time = timed(brute_force_best_avg, courses)
+        results_cache.entries.clear()
+        searched, search_time = timed(lambda: list(courses.ranked_combinations()))
+        gc.collect()  # the garbage of the brute force search is not collected during the timed run
+        results, numpy_time = timed(courses.exhaustive_combinations)
+        same = same_results(expected, results) and same_results(expected, searched)
+        all_same &= same
+        print(f'{n}\t{len(results)}\t{brute_time:.3f}\t\t{search_time:.3f}\t\t{numpy_time:.3f}\t\t'
+              f'{brute_time / numpy_time:.0f}x\t{same}')
+    return all_same
+
+
+def bench_points_match():
+    """compares both engines to the brute force search when the points are matched at least or within a tolerance,
+    for targets that no combination sums up to exactly. returns whether both gave the results of the brute force
+    search"""
+    print('\nchoice\tmatch\t\ttarget\tresults\tbrute(s)\tsearch(s)\tnumpy(s)\tsame')
+    all_same = True
+    for n in [12, 16, 18]:
+        courses = synthetic_courses(n, seed=n)
+        target = int(courses.sum_points(courses.choice_courses) / 2) + 0.25  # the points are multiples of 0.5
+        for match, tolerance in [(MATCH_AT_LEAST, 0), (MATCH_TOLERANCE, 1)]:
+            courses.set_final_points_amount(target, match, tolerance)
+            expected, brute_time = timed(brute_force_best_avg, courses)
+            searched, search_time = timed(lambda: list(courses.search_combinations()))
+            results, numpy_time = timed(courses.exhaustive_combinations)
+            same = same_results(expected, results) and same_results(expected, searched)
+            all_same &= same
+            print(f'{n}\t{match:<10}\t{target}\t{len(results)}\t{brute_time:.3f}\t\t{search_time:.3f}\t\t'
+                  f'{numpy_time:.3f}\t\t{same}')
+    return all_same
+
+
+def bench_parallel(n: int = 24):
+    """compares the enumeration of best_avg in one process and in a process per core"""
+    workers = os.cpu_count()
+    courses = synthetic_courses(n, seed=n)
+    courses.set_final_points_amount(int(courses.sum_points(courses.choice_courses) / 2))
+    results_cache.entries.clear()
+    serial, serial_time = timed(courses.best_avg)
+    results_cache.entries.clear()
+    parallel, parallel_time = timed(courses.best_avg, None, workers)
+    print(f'\n{n} choice courses, {len(serial)} results: 1 process {serial_time:.3f}s, {workers} processes '
+          f'{parallel_time:.3f}s, same: {serial == parallel}')
+
+
+def bench_what_if(scenarios: int = 10000):
+    """compares scoring grade changes with what_if_many, with what_if and by copying and editing the courses"""
+    courses = synthetic_courses(20, n_other=200, seed=scenarios)
+    rnd = random.Random(scenarios)
+    ids = [rnd.choice(list(courses.by_id)) for _ in range(scenarios)]
+    grades = [float(rnd.randint(60, 100)) for _ in range(scenarios)]
+    _, many_time = timed(courses.what_if_many, ids, grades)
+    start = time.perf_counter()
+    for id, grade in zip(ids, grades):
+        courses.what_if(Course(id, '', courses.course_values(id)[0], grade, ''))
+    single_time = time.perf_counter() - start
+    start = time.perf_counter()
+    for id, grade in zip(ids[:100], grades[:100]):
+        edited = courses.copy()
+        edited.add_course(Course(id, '', courses.course_values(id)[0], grade, ''))
+    copy_time = (time.perf_counter() - start) * scenarios / 100
+    print(f'\n{scenarios} what-if scenarios: what_if_many {many_time:.4f}s, what_if {single_time:.4f}s, '
+          f'copy and edit ~{copy_time:.2f}s')
+
+
+def bench_quotas():
+    """times the category quota optimizer on transcripts of growing size"""
+    print('\ncourses\tquotas(s)\tbest average')
+    for n in [50, 100, 200, 400]:
+        courses = synthetic_courses(n // 3, n_other=n - n // 3, seed=n)
+        total = courses.total_points
+        quotas = {CHOICE: (total / 10, total / 5), 'science': (total / 20, None), 'humanities': (None, total / 10)}
+        best, quota_time = timed(courses.best_avg_with_quotas, quotas, total / 2)
+        print(f'{n}\t{quota_time:.4f}\t\t{best[1]:.3f}' if best else f'{n}\t{quota_time:.4f}\t\tinfeasible')
+
+
+def bench_sweep(n: int = 30):
+    """compares the best average of every amount of choice points in one sweep and by a best_avg per amount"""
+    courses = generate_courses(n, choice_ratio=1, seed=n)
+    sweep, sweep_time = timed(courses.best_avg_sweep)
+    start = time.perf_counter()
+    same = True
+    for points, avg, _ in sweep:
+        results_cache.entries.clear()
+        courses.set_final_points_amount(points)
+        same &= abs(courses.best_avg(1)[0][1] - avg) < 1e-9
+    search_time = time.perf_counter() - start
+    print(f'\n{n} choice courses, {len(sweep)} amounts of points: sweep {sweep_time:.4f}s, best_avg per amount '
+          f'{search_time:.3f}s, same: {same}')
+
+
+def bench_loading():
+    """times adding courses one by one, copying and loading them from a CSV file, to show they grow linearly"""
+    print('\nrows\tadd(s)\tcopy(s)\tload(s)\tus/row')
+    for rows in [1000, 10000, 100000]:
+        rnd = random.Random(rows)
+        new_courses = [Course(str(i), f'course {i}', rnd.choice(POINTS), float(rnd.randint(60, 100)),
+                              rnd.choice(CATEGORIES)) for i in range(rows)]
+        courses = Courses()
+        start = time.perf_counter()
+        for course in new_courses:
+            courses.add_course(course)
+        add_time = time.perf_counter() - start
+        _, copy_time = timed(courses.copy)
+        with tempfile.TemporaryDirectory() as directory:
+            filename = os.path.join(directory, 'transcript.csv')
+            with open(filename, 'w') as file:
+                file.write('\n'.join(str(course) for course in new_courses))
+            _, load_time = timed(load_courses, filename)
+        print(f'{rows}\t{add_time:.3f}\t{copy_time:.3f}\t{load_time:.3f}\t{add_time / rows * 1e6:.2f}')
+
+
+def bench_columnar(rows: int = 200000):
+    """compares the memory and the statistics time of Courses and ColumnarCourses"""
+    print('\nbackend\t\tMB\tstats(s)')
+    rnd = random.Random(rows)
+    for backend in [Courses, ColumnarCourses]:
+        tracemalloc.start()
+        courses = backend()
+        for i in range(rows):
+            grade = 'pass' if rnd.random() < 0.1 else float(rnd.randint(60, 100))
+            courses.add_course(Course(str(i), f'course {i % 500}', rnd.choice(POINTS), grade, rnd.choice(CATEGORIES)))
+        memory = tracemalloc.get_traced_memory()[0] / 2 ** 20
+        tracemalloc.stop()
+        start = time.perf_counter()
+        courses.get_avg(), courses.get_sd(), courses.category_counter, courses.graded_courses()
+        print(f'{backend.__name__:<16}{memory:.1f}\t{time.perf_counter() - start:.4f}')
+
+
+def bench_binary_loading():
+    """compares loading a transcript from CSV and from the binary format, into Courses and ColumnarCourses"""
+    print('\nrows\tcsv(s)\tnpy(s)\tnpy columnar(s)\tcsv(MB)\tnpy(MB)\tsame')
+    for rows in [10000, 100000, 1000000]:
+        rnd = random.Random(rows)
+        courses = ColumnarCourses()
+        courses.add_courses(Course(str(i), f'course {i % 500}', rnd.choice(POINTS), 'pass' if rnd.random() < 0.1
+                                   else float(rnd.randint(60, 100)), rnd.choice(CATEGORIES)) for i in range(rows))
+        with tempfile.TemporaryDirectory() as directory:
+            csv_file, npy_file = os.path.join(directory, 'transcript.csv'), os.path.join(directory, 'transcript.npy')
+            save_courses(courses, csv_file)
+            convert_transcript(csv_file, npy_file)
+            (from_csv, _), csv_time = timed(load_courses, csv_file)
+            (from_npy, _), npy_time = timed(load_courses, npy_file)
+            (columnar, _), columnar_time = timed(load_courses, npy_file, ColumnarCourses())
+            same = str(from_csv) == str(from_npy) == str(columnar)
+            print(f'{rows}\t{csv_time:.3f}\t{npy_time:.3f}\t{columnar_time:.3f}\t\t'
+                  f'{os.path.getsize(csv_file) / 2 ** 20:.1f}\t{os.path.getsize(npy_file) / 2 ** 20:.1f}\t{same}')
+
+
+def bench_saving(rows: int = 100000, edits: int = 10):
+    """compares rewriting a transcript with appending a few edits to its journal"""
+    print('\nrows\tedits\trewrite(s)\tjournal(s)')
+    rnd = random.Random(rows)
+    courses = Courses()
+    courses.add_courses(Course(str(i), f'course {i}', rnd.choice(POINTS), float(rnd.randint(60, 100)),
+                               rnd.choice(CATEGORIES)) for i in range(rows))
+    with tempfile.TemporaryDirectory() as directory:
+        filename = os.path.join(directory, 'transcript.csv')
+        _, rewrite_time = timed(save_changes, courses, filename)
+        for i in range(edits):
+            courses.add_course(Course(str(rnd.randrange(rows)), 'edited', 2.0, float(rnd.randint(60, 100)), CHOICE))
+        _, journal_time = timed(save_changes, courses, filename)
+    print(f'{rows}\t{edits}\t{rewrite_time:.4f}\t\t{journal_time:.4f}')
+
+
+def check_journal(rows: int = 1000):
+    """saves edits to the journal of a transcript and reloads them, then rewrites the file without deleting the
+    journal, as a crash in the middle of a compaction would, and reloads it again. returns whether both reloads gave
+    the saved courses"""
+    courses = generate_courses(rows, seed=rows)
+    edited = next(iter(courses.courses))
+
+    def lines(courses):
+        return sorted(str(course) for course in courses.courses)
+    with tempfile.TemporaryDirectory() as directory:
+        filename = os.path.join(directory, 'transcript.csv')
+        save_changes(courses, filename)
+        courses.add_course(Course(edited.id, edited.name, edited.points, 90.0, edited.category))
+        journaled = not save_changes(courses, filename)
+        reloaded, errors = load_courses(filename)
+        round_trip = journaled and not errors and lines(reloaded) == lines(courses)
+        reloaded.add_course(Course(edited.id, edited.name, edited.points, 100.0, edited.category))
+        save_courses(reloaded, filename)  # the journal is left behind
+        after_crash, errors = load_courses(filename)
+        crash = len(errors) == 1 and lines(after_crash) == lines(reloaded)
+        after_crash.add_course(Course(edited.id, edited.name, edited.points, 80.0, edited.category))
+        save_changes(after_crash, filename)  # starts a new journal over the stale one
+        crash &= lines(load_courses(filename)[0]) == lines(after_crash)
+    print(f'\njournal\tround trip\tcrash\n{rows}\t{"ok" if round_trip else "FAIL"}\t\t{"ok" if crash else "FAIL"}')
+    return round_trip and crash
+
+
+def bench_plots(courses_amount: int = 200, redraws: int = 10):
+    """compares drawing the plots on new figures with updating the kept ones after an edit"""
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    import plots
+    courses = synthetic_courses(20, n_other=courses_amount - 20, seed=courses_amount)
+    rnd = random.Random(courses_amount)
+    print('\nplot\t\tnew figure(s)\tin place(s)')
+    for name, kind in plots.PLOTS.items():
+        start = time.perf_counter()
+        for _ in range(redraws):
+            plot = kind()
+            plot.update(courses)
+            FigureCanvasAgg(plot.figure).draw()
+        new_time = (time.perf_counter() - start) / redraws
+        canvas = FigureCanvasAgg(plot.figure)
+        start = time.perf_counter()
+        for _ in range(redraws):
+            id = rnd.choice(list(courses.by_id))
+            courses.add_course(Course(id, courses.name_of(id), courses.course_values(id)[0],
+                                      float(rnd.randint(60, 100)), courses.by_id[id].category))
+            plot.update(courses)
+            canvas.draw()
+        print(f'{name:<16}{new_time:.4f}\t\t{(time.perf_counter() - start) / redraws:.4f}')
+
+
+def bench_cohort(files: int = 2000):
+    """times the cohort statistics of a directory of transcripts, and the memory kept by the main process for
+    growing amounts of files, which should stay flat. returns whether the percentiles of the courses are those of
+    np.percentile over their grades"""
+    import cohort
+    print('\nfiles\tcohort(s)\tfiles/s\tpeak MB')
+    grades = {}
+    with tempfile.TemporaryDirectory() as directory:
+        transcripts = os.path.join(directory, 'transcripts')
+        os.makedirs(transcripts)
+        written = 0
+        for amount in [files // 4, files]:
+            for i in range(written, amount):
+                courses = synthetic_courses(10, seed=i)
+                for course in courses.courses:
+                    if not course.is_binary:
+                        grades.setdefault(course.id, []).append(course.grade)
+                save_courses(courses, os.path.join(transcripts, f'{i}.csv'))
+            written = amount
+            tracemalloc.start()
+            stats, seconds = cohort.run(transcripts, os.path.join(directory, 'out'), workers=0)
+            memory = tracemalloc.get_traced_memory()[1] / 2 ** 20
+            tracemalloc.stop()
+            print(f'{stats.files}\t{seconds:.3f}\t\t{stats.files / seconds:.0f}\t{memory:.1f}')
+    same = all(row[5:] == [round(float(np.percentile(grades[row[0]], q)), 3) for q in cohort.PERCENTILES]
+               for row in stats.course_rows())
+    print(f'percentiles as np.percentile: {same}')
+    return same
+
+
+def suite_cases(directory: str):
+    """returns the cases of the suite: name -> (setup, case). setup builds the input of a run, which is not timed,
+    and case is the timed part. the files of the cases are written to directory"""
+    cases = {}
+    transcript = generate_courses(SUITE_ROWS, seed=SUITE_ROWS)
+    for extension in ['.csv', '.npy']:
+        filename = os.path.join(directory, f'transcript{extension}')
+        save_courses(transcript, filename)
+        cases[f'load {extension[1:]}'] = (lambda filename=filename: filename, load_courses)
+    ids = list(transcript.by_id)
+    replaced = [Course(id, 'edited', 2.0, 90.0, CHOICE) for id in ids[::10]]
+
+    def churn(courses):
+        for course in replaced:
+            courses.remove_course(course)
+            courses.add_course(course)
+    cases['add/remove churn'] = (transcript.copy, churn)
+
+    def update_sd(courses):
+        for _ in range(SUITE_ROWS):
+            courses.update_sd()
+    cases['update_sd'] = (lambda: transcript, update_sd)
+    cases['copy'] = (lambda: transcript, Courses.copy)
+
+    def edit_session(courses):  # what the edit window does instead of copying
+        session = courses.edit()
+        for course in replaced:
+            session.remove_course(course)
+            session.add_course(course)
+        session.commit()
+    cases['edit session'] = (transcript.copy, edit_session)
+
+    def fresh_search(courses):  # the results cache would make later runs free
+        results_cache.entries.clear()
+        return courses
+    for n in SUITE_CHOICE:
+        courses = generate_courses(n, choice_ratio=1, seed=n)
+        courses.set_final_points_amount(int(courses.total_points / 2))
+        cases[f'best_avg {n}'] = (lambda courses=courses: fresh_search(courses),
+                                  lambda courses: courses.best_avg(SAVED_OPTIONS))
+
+    courses = generate_courses(30, choice_ratio=1, seed=30)
+    cases['best_avg_sweep 30'] = (lambda courses=courses: courses, Courses.best_avg_sweep)
+
+    def save_best_options(courses):
+        with open(os.path.join(directory, 'best_options.txt'), 'w') as file:
+            write_best_options(courses, courses.ranked_combinations(SAVED_OPTIONS), file)
+    courses = generate_courses(60, choice_ratio=0.5, seed=60)
+    courses.set_final_points_amount(int(courses.sum_points(courses.choice_courses) / 2))
+    cases['save_best_options'] = (lambda: fresh_search(courses), save_best_options)
+    return cases
+
+
+def run_suite(repeats: int = SUITE_REPEATS):
+    """runs the cases of the suite and returns the fastest seconds of each, by name"""
+    timings = {}
+    with tempfile.TemporaryDirectory() as directory:
+        for name, (setup, case) in suite_cases(directory).items():
+            seconds = []
+            for _ in range(repeats):
+                argument = setup()
+                gc.collect()  # garbage of the previous runs is not collected during the timed one
+                seconds.append(timed(case, argument)[1])
+            timings[name] = min(seconds)
+            print(f'{name:<24}{timings[name]:.4f}s')
+    return timings
+
+
+def compare_suite(timings: dict, baseline: dict, tolerance: float = TOLERANCE):
+    """prints the timings next to a baseline and returns the names of the cases slower than it by more than the
+    tolerance"""
+    print('\ncase\t\t\tbaseline(s)\tnow(s)\tchange')
+    regressions = []
+    for name, seconds in timings.items():
+        if name not in baseline:
+            print(f'{name:<24}-\t\t{seconds:.4f}\tnew')
+            continue
+        change = seconds / baseline[name] - 1 if baseline[name] else 0
+        if change > tolerance:
+            regressions.append(name)
+        print(f'{name:<24}{baseline[name]:.4f}\t\t{seconds:.4f}\t{change:+.0%}'
+              + ('\tREGRESSION' if change > tolerance else ''))
+    return regressions
+
+
+def import_time(module: str):
+    """returns the microseconds it takes to import a module in a new interpreter, and the modules it imported,
+    as reported by python -X importtime"""
+    report = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'], capture_output=True,
+                            text=True, cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stderr
+    imported, total = set(), 0
+    for line in report.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        imported.add(name.strip().split('.')[0])
+        if name.strip() == module:
+            total = int(cumulative)
+    return total, imported
+
+
+def bench_import_time(runs: int = 3):
+    """checks the import time of the modules against IMPORT_BUDGET_MS (best of a few runs), and that the model and
+    the batch runner don't import the GUI or plotting libraries. returns whether everything is within budget"""
+    print('\nmodule\t\t\timport(ms)\tbudget(ms)')
+    within_budget = True
+    for module, budget in IMPORT_BUDGET_MS.items():
+        results = [import_time(module) for _ in range(runs)]
+        milliseconds = min(total for total, _ in results) / 1000
+        heavy = [name for name in HEAVY_MODULES if name in results[0][1]]
+        ok = milliseconds <= budget and (module == 'grade_manipulator' or not heavy)
+        within_budget &= ok
+        print(f'{module:<24}{milliseconds:.1f}\t\t{budget}\t\t{"ok" if ok else "FAIL"}'
+              + (f' (imports {", ".join(heavy)})' if heavy and module != 'grade_manipulator' else ''))
+    return within_budget
+
+
+def main():
+    parser = argparse.ArgumentParser(description='benchmarks of the grade manipulations')
+    parser.add_argument('--suite', action='store_true', help='only times the hot paths of the suite')
+    parser.add_argument('--save', help='writes the timings of the suite to this JSON baseline')
+    parser.add_argument('--compare', help='fails if the suite is slower than this JSON baseline')
+    parser.add_argument('--tolerance', type=float, default=TOLERANCE,
+                        help=f'allowed slowdown against the baseline, as a share (default: {TOLERANCE})')
+    args = parser.parse_args()
+    if args.suite or args.save or args.compare:
+        timings = run_suite()
+        if args.save:
+            with open(args.save, 'w') as file:
+                json.dump(timings, file, indent=2)
+        if args.compare:
+            with open(args.compare) as file:
+                regressions = compare_suite(timings, json.load(file), args.tolerance)
+            if regressions:
+                print(f'slower than the baseline: {", ".join(regressions)}')
+                sys.exit(1)
+        return
+    same = [bench_best_avg(), bench_exhaustive(), bench_points_match()]
+    bench_parallel()
+    bench_what_if()
+    bench_quotas()
+    bench_sweep()
+    bench_loading()
+    bench_columnar()
+    bench_binary_loading()
+    bench_saving()
+    same.append(check_journal())
+    bench_plots()
+    same.append(bench_cohort())
+    if not bench_import_time() or not all(same):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,234 @@
+"""statistics of a whole cohort over a directory of transcript files (CSV or binary), without the GUI.
+the files are scanned in parallel and reduced to sums and histograms that merge in any order, so the memory used
+does not grow with the amount of files
+
+usage: python cohort.py DIRECTORY [--out DIRECTORY] [--workers N]
+"""
+import argparse
+import csv
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from itertools import islice
+
+import numpy as np
+
+import profiling
+from courses import MAX_GRADE, TRANSCRIPT_EXTENSIONS, load_courses
+
+
+GRADES = np.arange(MAX_GRADE + 1)  # whole grades counted by the grade histograms, failing ones included
+GRADE_EDGES = np.append(GRADES - 0.5, MAX_GRADE + 0.5)  # a bin per whole grade, centered on it
+AVERAGE_EDGES = np.linspace(0, MAX_GRADE, 10001)  # students are ranked by their average to 0.01 of a grade
+PERCENTILES = [10, 25, 50, 75, 90]  # percentiles of the grades of every course
+FILES_PER_TASK = 32  # transcripts sent to a worker process at once
+PENDING_TASKS = 2  # tasks waiting for each worker process, which bounds the partial results kept in memory
+COURSES_FILE = 'cohort_courses.csv'
+CATEGORIES_FILE = 'cohort_categories.csv'
+HISTOGRAM_FILE = 'cohort_histogram.csv'
+STUDENTS_FILE = 'cohort_students.csv'
+
+
+def bin_of(value: float, edges):
+    """returns the histogram bin of a value, values out of the edges go to the first or the last bin"""
+    return min(max(int(np.searchsorted(edges, value, side='right')) - 1, 0), len(edges) - 2)
+
+
+def histogram_percentile(counts, values, q: float):
+    """returns the q-th percentile of a histogram that counts counts[i] times values[i], interpolated between the
+    closest ranks as np.percentile does, or None if it is empty"""
+    total = int(counts.sum())
+    if not total:
+        return None
+    cumulative = np.cumsum(counts)
+    rank = q / 100 * (total - 1)
+    below = int(rank)
+    lower, upper = values[np.searchsorted(cumulative, [below, min(below + 1, total - 1)], side='right')]
+    return float(lower + (rank - below) * (upper - lower))
+
+
+class CohortStats:
+    """partial statistics of some transcripts. every field is a sum or a histogram, so the statistics of two sets
+    of transcripts merge into the statistics of both"""
+    def __init__(self):
+        self.files = 0
+        self.malformed_lines = 0
+        self.course_names = {}  # course id -> the first name seen for it
+        self.course_grades = {}  # course id -> [students, sum of grades, sum of squared grades, grades histogram]
+        self.categories = {}  # category -> [points, graded points, sum of points * grade]
+        self.grade_points = np.zeros(len(GRADE_EDGES) - 1)  # points of all the cohort per grade bin
+        self.averages = np.zeros(len(AVERAGE_EDGES) - 1, dtype=np.int64)  # students per average bin
+
+    def add_transcript(self, courses, malformed_lines: int = 0):
+        """adds the courses of a student"""
+        self.files += 1
+        self.malformed_lines += malformed_lines
+        for course in courses.courses:
+            totals = self.categories.setdefault(course.category, [0.0, 0.0, 0.0])
+            totals[0] += course.points
+            if course.is_binary:
+                continue
+            grade = float(course.grade)
+            totals[1] += course.points
+            totals[2] += course.points * grade
+            self.course_names.setdefault(course.id, course.name)
+            if course.id not in self.course_grades:
+                self.course_grades[course.id] = [0, 0.0, 0.0, np.zeros(len(GRADE_EDGES) - 1, dtype=np.int64)]
+            stats = self.course_grades[course.id]
+            stats[0] += 1
+            stats[1] += grade
+            stats[2] += grade ** 2
+            stats[3][bin_of(grade, GRADE_EDGES)] += 1
+            self.grade_points[bin_of(grade, GRADE_EDGES)] += course.points
+        if courses.points_without_binary:
+            self.averages[bin_of(courses.get_avg(), AVERAGE_EDGES)] += 1
+
+    def merge(self, other):
+        """adds the statistics of other transcripts"""
+        self.files += other.files
+        self.malformed_lines += other.malformed_lines
+        for id, name in other.course_names.items():
+            self.course_names.setdefault(id, name)
+        for id, (students, grades, squares, histogram) in other.course_grades.items():
+            if id not in self.course_grades:
+                self.course_grades[id] = [students, grades, squares, histogram]
+                continue
+            stats = self.course_grades[id]
+            stats[0] += students
+            stats[1] += grades
+            stats[2] += squares
+            stats[3] += histogram
+        for category, values in other.categories.items():
+            totals = self.categories.setdefault(category, [0.0, 0.0, 0.0])
+            for i, value in enumerate(values):
+                totals[i] += value
+        self.grade_points += other.grade_points
+        self.averages += other.averages
+
+    def average(self):
+        """returns the average grade of the whole cohort, weighted by points"""
+        graded = sum(totals[1] for totals in self.categories.values())
+        return sum(totals[2] for totals in self.categories.values()) / graded if graded else 0
+
+    def course_rows(self):
+        """returns a row per course: id, name, students, average, sd and the PERCENTILES of its grades"""
+        rows = []
+        for id, (students, grades, squares, histogram) in sorted(self.course_grades.items()):
+            avg = grades / students
+            sd = max(squares / students - avg ** 2, 0) ** 0.5
+            rows.append([id, self.course_names[id], students, round(avg, 3), round(sd, 3)] +
+                        [round(histogram_percentile(histogram, GRADES, q), 3) for q in PERCENTILES])
+        return rows
+
+    def category_rows(self):
+        """returns a row per category: category, points and average weighted by points"""
+        return [[category, points, round(relative / graded, 3) if graded else '']
+                for category, (points, graded, relative) in sorted(self.categories.items())]
+
+    def percentile_rank(self, avg: float):
+        """returns the share (in %) of the students with a lower average, counting half of those in its bin"""
+        i = bin_of(avg, AVERAGE_EDGES)
+        below = self.averages[:i].sum() + self.averages[i] / 2
+        return float(100 * below / self.averages.sum())
+
+    def write(self, out_dir: str):
+        """writes the course, category and grade histogram statistics to CSV files in out_dir"""
+        with open(os.path.join(out_dir, COURSES_FILE), 'w', newline='') as file:
+            writer = csv.writer(file)
+            writer.writerow(['id', 'name', 'students', 'average', 'sd'] + [f'p{q}' for q in PERCENTILES])
+            writer.writerows(self.course_rows())
+        with open(os.path.join(out_dir, CATEGORIES_FILE), 'w', newline='') as file:
+            writer = csv.writer(file)
+            writer.writerow(['category', 'points', 'average'])
+            writer.writerows(self.category_rows())
+        with open(os.path.join(out_dir, HISTOGRAM_FILE), 'w', newline='') as file:
+            writer = csv.writer(file)
+            writer.writerow(['grade', 'points'])
+            writer.writerows(zip(GRADES.tolist(), self.grade_points.tolist()))
+
+
+def scan_files(filenames: list):
+    """reads some transcripts and returns their statistics, with the (name, average or None if no course has a
+    numeric grade) of every student"""
+    stats = CohortStats()
+    averages = []
+    for filename in filenames:
+        courses, errors = load_courses(filename)
+        stats.add_transcript(courses, len(errors))
+        name = os.path.splitext(os.path.basename(filename))[0]
+        averages.append((name, courses.get_avg() if courses.points_without_binary else None))
+    return stats, averages
+
+
+def transcript_chunks(directory: str):
+    """yields the transcript filenames of a directory in lists of FILES_PER_TASK, without listing them all first"""
+    with os.scandir(directory) as entries:
+        names = (entry.path for entry in entries if entry.is_file() and entry.name.endswith(TRANSCRIPT_EXTENSIONS))
+        while chunk := list(islice(names, FILES_PER_TASK)):
+            yield chunk
+
+
+def scan_cohort(directory: str, students_file, workers=None):
+    """scans every transcript in the directory and returns the statistics of the cohort. the average of every
+    student is written to the students_file CSV writer as soon as its task is done. with workers=0 the files are
+    scanned in this process, otherwise at most PENDING_TASKS tasks per worker process are queued at once"""
+    stats = CohortStats()
+    chunks = transcript_chunks(directory)
+    if workers == 0:
+        for chunk in chunks:
+            partial, averages = scan_files(chunk)
+            stats.merge(partial)
+            students_file.writerows(averages)
+        return stats
+    workers = workers or os.cpu_count()
+    with ProcessPoolExecutor(workers) as executor:
+        pending = set()
+        while True:
+            for chunk in islice(chunks, PENDING_TASKS * workers - len(pending)):
+                pending.add(executor.submit(scan_files, chunk))
+            if not pending:
+                return stats
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                partial, averages = future.result()
+                stats.merge(partial)
+                students_file.writerows(averages)
+
+
+def run(directory: str, out_dir: str, workers=None):
+    """computes the statistics of the cohort of a directory of transcripts and writes them to out_dir, along with
+    the average and its percentile rank for every student. returns the statistics and the seconds it took"""
+    os.makedirs(out_dir, exist_ok=True)
+    start = time.perf_counter()
+    students = os.path.join(out_dir, STUDENTS_FILE)
+    unranked = students + '.unranked'
+    with open(unranked, 'w', newline='') as file:
+        stats = scan_cohort(directory, csv.writer(file), workers)
+    stats.write(out_dir)
+    with open(unranked, 'r', newline='') as source, open(students, 'w', newline='') as file:  # ranked in a stream
+        writer = csv.writer(file)
+        writer.writerow(['name', 'average', 'percentile'])
+        for name, avg in csv.reader(source):
+            writer.writerow([name, avg, round(stats.percentile_rank(float(avg)), 2) if avg else ''])
+    os.remove(unranked)
+    return stats, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description='calculates the statistics of the cohort of a directory of '
+                                                 'transcripts')
+    parser.add_argument('directory', help='directory of transcript files (CSV or binary)')
+    parser.add_argument('--out', default='cohort', help='directory for the statistics (default: cohort)')
+    parser.add_argument('--workers', type=int,
+                        help='amount of worker processes, 0 to run in this process (default: one per core)')
+    args = parser.parse_args()
+    stats, seconds = run(args.directory, args.out, args.workers)
+    seconds = max(seconds, 1e-9)
+    print(f'{stats.files} files, {len(stats.course_grades)} courses, cohort average {stats.average():.3f} in '
+          f'{seconds:.2f}s ({stats.files / seconds:.1f} files/s)')
+
+
+profiling.instrument(CohortStats, ['add_transcript', 'merge', 'write'])
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,1583 @@
+"""the courses of a transcript and their calculations, usable without the GUI"""
+import csv
+import gc
+import hashlib
+import json
+import locale
+import math
+import os
+import shutil
+import sys
+import tempfile
+import numpy as np
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from heapq import heappush, heappop
+from itertools import count, islice, repeat
+
+import profiling
+
+
+CHOICE = 'choice'
+MIN_GRADE = 60
+MAX_GRADE = 100
+SAVED_OPTIONS = 1000  # number of best combinations written to a best options file
+GRADE_PIVOT = (MIN_GRADE + MAX_GRADE) / 2  # grades are summed as deviations from it to keep the sums small
+EXHAUSTIVE_CHOICE_COURSES = 24  # up to this many choice courses, the full ranked list is built by enumeration
+HALF_BITS = 12  # subsets of the first HALF_BITS choice courses are paired with subsets of the rest
+BOUND_DIGITS = 9  # decimals the search compares bounds and averages to, so equal ones tie exactly
+CHUNK_SIZE = 2 ** 20  # pairs of subsets checked in one NumPy batch
+WORKER_TASKS = 4  # ranges of subsets given to each worker process, to balance their load
+shared_tables = []  # subset tables and matching sums of exhaustive_combinations, set once in each worker process
+MAX_POINTS_DIGITS = 3  # decimal digits of points kept when scaling them to integers
+TRANSCRIPT_FIELDS = 5  # id, name, points, grade, category
+LOAD_BATCH_SIZE = 10000  # courses per batch when reading a transcript
+CACHE_SIZE = 128  # best average results kept in memory
+MERGE_BLOCK = 256  # point amounts of a category merged at once by the quota optimizer
+BOUND_CELLS = 2 ** 22  # most (course, scaled points) cells of the exact bound tables of the search, 8 bytes each
+SWEEP_CELLS = 2 ** 30  # most (course, total points, graded points) cells the points sweep keeps, one bit each
+BINARY_EXTENSION = '.npy'  # transcripts saved as a NumPy record array instead of CSV
+TRANSCRIPT_EXTENSIONS = ('.csv', BINARY_EXTENSION)
+TRANSCRIPT_ENCODING = 'utf-8'  # of the CSV transcripts and their journals, whatever the encoding of the system
+LEGACY_ENCODING = locale.getpreferredencoding(False)  # of the CSV transcripts written before TRANSCRIPT_ENCODING
+DECIMAL_DIGITS = 6  # most decimal digits of points and grades stored as scaled integers by the binary format
+JOURNAL_SUFFIX = '.journal'  # changes saved since the transcript file was last rewritten are appended to it
+JOURNAL_HEADER = '#,'  # first line of a journal, before the file_token of the version of the file it extends
+COMPACT_ENTRIES = 1000  # journal entries after which the transcript file is rewritten and the journal deleted
+MATCH_EXACT = 'exact'  # combinations sum up to final_points_amount
+MATCH_AT_LEAST = 'at least'  # combinations sum up to the smallest reachable amount of at least final_points_amount
+MATCH_TOLERANCE = 'tolerance'  # combinations sum up to final_points_amount, give or take points_tolerance
+MATCH_MODES = (MATCH_EXACT, MATCH_AT_LEAST, MATCH_TOLERANCE)
+
+
+def points_scale(amounts):
+    """returns the smallest power of 10 that turns all the given amounts of points into whole numbers"""
+    for digits in range(MAX_POINTS_DIGITS + 1):
+        scale = 10 ** digits
+        if all(abs(amount * scale - round(amount * scale)) < 1e-6 for amount in amounts):
+            return scale
+    return 10 ** MAX_POINTS_DIGITS
+
+
+def subset_sums(values):
+    """returns the sums of all the subsets of the values, the subset of bitmask m at index m"""
+    sums = np.zeros(1, dtype=values.dtype)
+    for value in values:
+        sums = np.concatenate([sums, sums + value])
+    return sums
+
+
+def match_subsets(low, high, sums, start, stop, limit=None):
+    """pairs the subsets tabulated in high[start:stop] with those in low, and returns the high rows, low rows and
+    averages of the pairs that sum up to within sums, a (lowest, highest) range, best average first (the first
+    `limit` of them if given)"""
+    low_bits = len(low[0]).bit_length() - 1
+    high_rows, low_rows, averages = [np.zeros(0, dtype=np.int64)], [np.zeros(0, dtype=np.int64)], [np.zeros(0)]
+    step = max(1, CHUNK_SIZE >> low_bits)
+    for chunk in range(start, stop, step):
+        totals = high[0][chunk:min(chunk + step, stop), None] + low[0][None, :]
+        high_index, low_index = np.nonzero((totals >= sums[0]) & (totals <= sums[1]))
+        points_sum = high[1][chunk + high_index] + low[1][low_index]
+        grades_sum = high[2][chunk + high_index] + low[2][low_index]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            averages.append(np.where(points_sum > 0, grades_sum / points_sum, 0.0))
+        high_rows.append(chunk + high_index)
+        low_rows.append(low_index)
+    high_rows, low_rows, averages = np.concatenate(high_rows), np.concatenate(low_rows), np.concatenate(averages)
+    order = np.argsort(-averages, kind='stable')[:limit]
+    return high_rows[order], low_rows[order], averages[order]
+
+
+def share_tables(low, high, sums):
+    """keeps the subset tables in a worker process, so they are sent to it only once"""
+    shared_tables[:] = [low, high, sums]
+
+
+def match_shared_subsets(start, stop, limit):
+    """match_subsets over the tables kept by share_tables"""
+    return match_subsets(*shared_tables, start, stop, limit)
+
+
+def subset_ids(ids):
+    """returns the tuples of ids of all the subsets of the ids, the subset of bitmask m at index m"""
+    subsets = [()]
+    for id in ids:
+        subsets += [subset + (id,) for subset in subsets]
+    return subsets
+
+
+def has_bit_between(bits: int, low: int, high: int):
+    """checks if a bitset of reachable sums contains any sum in the range [low, high]"""
+    low = max(low, 0)
+    if high < low:
+        return False
+    return bool((bits >> low) & ((1 << (high - low + 1)) - 1))
+
+
+def bit_array(bits: int, size: int):
+    """returns the first `size` bits of a bitset of reachable sums as a NumPy array of 0 and 1, bit s at index s"""
+    data = np.frombuffer(bits.to_bytes(size // 8 + 1, 'little'), dtype=np.uint8)
+    return np.unpackbits(data, bitorder='little')[:size]
+
+
+def bound_tables(items, reach: list, scale: int, highest: int):
+    """returns the tables of the exact bound of best_first_search over its (id, scaled points, graded points,
+    relative grades) items, the graded ones first, and the bitsets of the sums reachable by items[i:]: the amount of
+    graded items, the best sums of relative grades of the graded items[i:] (row i) for every scaled sum of their
+    points up to highest (-inf if they can't reach it), the points of every scaled sum and how many sums up to s the
+    binary items[i:] reach (row i - the amount of graded items). returns False if they don't fit in BOUND_CELLS or if
+    the points are not exact at this scale"""
+    graded_count = sum(1 for item in items if item[2])
+    if max(graded_count + 1, len(items) - graded_count + 1) * (highest + 1) > BOUND_CELLS or \
+            any(abs(item[1] - item[2] * scale) > 1e-6 for item in items[:graded_count]):
+        return False
+    best = np.full((graded_count + 1, highest + 1), -np.inf)
+    best[graded_count, 0] = 0.0
+    for i in reversed(range(graded_count)):
+        _, scaled_points, _, relative_grades = items[i]
+        best[i] = best[i + 1]
+        if scaled_points <= highest:
+            np.maximum(best[i + 1, scaled_points:], best[i + 1, :highest + 1 - scaled_points] + relative_grades,
+                       out=best[i, scaled_points:])
+    free_sums = [np.cumsum(bit_array(reach[i] | 1, highest + 1)) for i in range(graded_count, len(items) + 1)]
+    return graded_count, best, np.arange(highest + 1) / scale, free_sums
+
+
+def best_first_search(choice_items, matching, limit=None, progress=None):
+    """yields the combinations of the choice items (id, points, relative grade or None if binary) whose sums of
+    points are within matching, the (scale, lowest, highest) of target_range, best average first, and stops after
+    `limit` of them if given. it reports to progress (a SearchProgress) if given, and stops once it is cancelled.
+    branch and bound: the choice courses are sorted by grade, sums that can't reach the matching range are pruned
+    by bitsets of reachable sums, and the search always expands the branch with the highest possible average.
+    branches are pushed with the fractional bound, which takes parts of courses and ignores the reachable sums.
+    when the tables fit in BOUND_CELLS and more branches than choice courses were expanded since the last
+    combination was found, a branch that comes out on top is bounded again exactly before it is expanded: by the
+    best sum of relative grades of the graded courses left for every scaled sum of their points, paired with the
+    sums the binary courses left can add"""
+    if matching is None:
+        return
+    scale, lowest, highest = matching
+    items = []  # (id, scaled points, graded points, relative grades)
+    for id, points, relative_grade in choice_items:
+        items.append((id, round(points * scale), 0.0 if relative_grade is None else points, relative_grade or 0.0))
+    items.sort(key=lambda z: (not z[2], -z[3] / z[2] if z[2] else 0, z[0]))  # ties by id, in every process
+    mask = (1 << (highest + 1)) - 1
+    n = len(items)
+    reach = [0] * (n + 1)  # bitset of the sums reachable by a non empty subset of items[i:]
+    free = [0.0] * (n + 1)  # points in items[i:] that don't affect the average
+    graded = [0.0] * (n + 1)  # graded points in items[i:]
+    for i in reversed(range(n)):
+        _, scaled_points, graded_points, _ = items[i]
+        reach[i] = reach[i + 1] | (((reach[i + 1] | 1) << scaled_points) & mask)
+        free[i] = free[i + 1] + scaled_points / scale - graded_points
+        graded[i] = graded[i + 1] + graded_points
+    tables = None  # built once the search stalls, False if they don't fit in BOUND_CELLS
+
+    def exact_bound(i, grades_sum, points_sum, least_missing, most_missing):
+        """the best average of a combination that adds between least_missing and most_missing scaled points out
+        of items[i:]"""
+        graded_count, best, sums_points, free_sums = tables
+        start = 0 if points_sum else 1  # adding nothing to nothing graded is an average of 0
+        averages = (grades_sum + best[min(i, graded_count), start:most_missing + 1]) / \
+            (points_sum + sums_points[start:most_missing + 1])  # -inf for the sums that can't be reached
+        counts = free_sums[max(i, graded_count) - graded_count]
+        if counts[-1] > 1:  # the binary items left can top up graded sums below least_missing
+            reached = counts[most_missing::-1].copy()  # reached[s]: binary sums up to most_missing - s
+            if least_missing > 0:
+                reached[:least_missing] -= counts[least_missing - 1::-1]
+            averages = averages[reached[start:] > 0]
+        else:
+            averages = averages[max(least_missing - start, 0):]
+        best_average = averages.max(initial=-np.inf)
+        return float(best_average) if best_average > -np.inf else 0
+
+    def bound(i, grades_sum, points_sum, least_missing, most_missing):
+        """upper bound for the average of a combination that adds between least_missing and most_missing
+        scaled points out of items[i:]"""
+        least = max(0.0, least_missing / scale - free[i])
+        most = min(most_missing / scale, graded[i])
+        taken = 0.0
+        for _, _, graded_points, relative_grades in islice(items, i, None):
+            if taken >= most or not graded_points:
+                break
+            grade = relative_grades / graded_points
+            improving = not points_sum or grade * points_sum > grades_sum
+            if taken >= least and not improving:
+                break
+            amount = min(graded_points, most - taken)
+            if not improving:
+                amount = min(amount, least - taken)
+            grades_sum += grade * amount
+            points_sum += amount
+            taken += amount
+        return grades_sum / points_sum if points_sum else 0
+
+    # the heap is ordered by (-bound, -depth, order): of the branches with the same bound the deepest one is
+    # expanded first, and complete combinations (deeper than any branch) come before branches that tie with them.
+    # the last field tells if the bound of a branch is the fractional one
+    order = count()
+    root = round(bound(0, 0.0, 0.0, lowest, highest), BOUND_DIGITS)
+    heap = [(-root, 0, next(order), 0, 0.0, 0.0, 0, (), True)]
+    yielded = stalled = 0  # branches expanded since the last combination
+    while heap and (limit is None or yielded < limit):
+        negative_bound, _, _, i, grades_sum, points_sum, points_scaled, chosen, fractional = heappop(heap)
+        if progress is not None:
+            if progress.cancelled:
+                return
+            progress.evaluated += 1
+        if fractional and stalled > n:
+            if tables is None:
+                tables = bound_tables(items, reach, scale, highest)
+            if tables:
+                upper = round(exact_bound(i, grades_sum, points_sum, max(lowest - points_scaled, 0),
+                                          highest - points_scaled), BOUND_DIGITS)
+                if upper < -negative_bound:  # other branches may beat it now
+                    heappush(heap, (-upper, -i, next(order), i, grades_sum, points_sum, points_scaled, chosen,
+                                    False))
+                    continue
+        if i is None:  # a complete combination, no branch left in the heap can beat it. grades_sum is its average
+            yielded += 1
+            stalled = 0
+            if progress is not None:
+                progress.best = max(progress.best or 0, grades_sum)
+            yield chosen, grades_sum
+            continue
+        stalled += 1
+        id, scaled_points, graded_points, relative_grades = items[i]
+        for include in (True, False):
+            new_grades, new_points, new_scaled, new_chosen = grades_sum, points_sum, points_scaled, chosen
+            if include:
+                new_grades += relative_grades
+                new_points += graded_points
+                new_scaled += scaled_points
+                new_chosen += (id,)
+                if lowest <= new_scaled <= highest:
+                    avg = new_grades / new_points if new_points else 0
+                    heappush(heap, (-round(avg, BOUND_DIGITS), -n - 1, next(order), None, avg, 0.0, 0, new_chosen,
+                                    False))
+                if new_scaled >= highest:
+                    continue
+            if has_bit_between(reach[i + 1], lowest - new_scaled, highest - new_scaled):
+                upper = bound(i + 1, new_grades, new_points, max(lowest - new_scaled, 0), highest - new_scaled)
+                heappush(heap, (-round(upper, BOUND_DIGITS), -i - 1, next(order), i + 1, new_grades, new_points,
+                                new_scaled, new_chosen, True))
+    if profiling.enabled:
+        profiling.count('search branches', next(order))
+
+
+def weighted_stats(points, grades, squares):
+    """returns the average and the standard deviation of grades from the sums of their points, of points * grade
+    and of points * (grade - GRADE_PIVOT) ** 2. works element-wise on NumPy arrays of sums"""
+    points = np.asarray(points, dtype=float)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        avg = np.where(points > 0, grades / points, 0.0)
+        variance = np.where(points > 0, squares / points - (avg - GRADE_PIVOT) ** 2, 0.0)
+    return avg, np.sqrt(np.maximum(variance, 0))
+
+
+def category_table(items, cap: int, ratio: float):
+    """0/1 knapsack over the courses of a category: returns the best sum of points * (grade - ratio) for every
+    amount of scaled points up to cap (-inf where it can't be reached) and, per course, where it was taken"""
+    values = np.full(cap + 1, -np.inf)
+    values[0] = 0
+    taken = np.zeros((len(items), cap + 1), dtype=bool)
+    for k, (_, scaled, points, relative) in enumerate(items):
+        if scaled > cap:
+            continue
+        candidate = np.full(cap + 1, -np.inf)
+        candidate[scaled:] = values[:cap + 1 - scaled] + (0.0 if relative is None else relative - ratio * points)
+        taken[k] = candidate > values
+        values = np.where(taken[k], candidate, values)
+    return values, taken
+
+
+def max_plus_merge(total, values):
+    """merges the best values of the categories so far, by total scaled points, with the best values of one more
+    category by its scaled points. returns the merged values and how many points the new category takes in each"""
+    size = len(total)
+    padded = np.concatenate([np.full(len(values), -np.inf), total])
+    merged, split = np.full(size, -np.inf), np.zeros(size, dtype=np.int64)
+    amounts = np.flatnonzero(np.isfinite(values))
+    for start in range(0, len(amounts), MERGE_BLOCK):
+        block = amounts[start:start + MERGE_BLOCK]
+        candidates = padded[len(values) + np.arange(size)[None, :] - block[:, None]] + values[block][:, None]
+        best = np.argmax(candidates, axis=0)
+        best_values = candidates[best, np.arange(size)]
+        better = best_values > merged
+        merged = np.where(better, best_values, merged)
+        split = np.where(better, block[best], split)
+    return merged, split
+
+
+def parse_course(row):
+    """builds a Course from the fields of a transcript line (id, name, points, grade, category), raising ValueError
+    with the reason if they are malformed. points must be a finite number above 0, and a numeric grade finite"""
+    if len(row) != TRANSCRIPT_FIELDS:
+        raise ValueError(f'expected {TRANSCRIPT_FIELDS} fields, got {len(row)}')
+    id, name, points, grade, category = [field.strip() for field in row]
+    if not id:
+        raise ValueError('missing course id')
+    try:
+        points = float(points)
+    except ValueError:
+        raise ValueError(f'points are not a number: {points!r}')
+    if not 0 < points < math.inf:
+        raise ValueError(f'points are not above 0 and finite: {points!r}')
+    try:
+        grade = float(grade)
+    except ValueError:
+        if not grade:
+            raise ValueError('missing grade')
+    else:
+        if not math.isfinite(grade):
+            raise ValueError(f'grade is not finite: {grade!r}')
+    return Course(id, name, points, grade, category)
+
+
+def parse_points_target(text: str):
+    """parses a points target: 'N' for exactly N points, 'N+' for the fewest points of at least N, 'N+-T' or 'N±T'
+    for N points give or take T. returns (amount, match, tolerance), raising ValueError if it is malformed"""
+    text = text.strip().replace('±', '+-')
+    amount, match, tolerance = text, MATCH_EXACT, '0'
+    if '+-' in text:
+        amount, tolerance = text.split('+-', 1)
+        match = MATCH_TOLERANCE
+    elif text.endswith('+'):
+        amount, match = text[:-1], MATCH_AT_LEAST
+    amount, tolerance = float(amount), float(tolerance)
+    if not (0 < amount < math.inf and 0 <= tolerance < math.inf):
+        raise ValueError(f'not a points target: {text!r}')
+    return amount, match, tolerance
+
+
+def iter_course_batches(filename: str, errors: list, batch_size: int = LOAD_BATCH_SIZE, progress=None,
+                        encoding: str = TRANSCRIPT_ENCODING):
+    """reads a transcript CSV file in one pass and yields its courses in lists of up to batch_size. the malformed
+    lines are skipped and appended to errors as (line number, reason). the bytes read so far are reported to
+    progress (a LoadProgress) if given, once per batch"""
+    batch = []
+    with open(filename, 'r', newline='', encoding=encoding) as file:
+        reader = csv.reader(file)
+        for row in reader:
+            if not any(field.strip() for field in row):
+                continue
+            try:
+                batch.append(parse_course(row))
+            except ValueError as error:
+                errors.append((reader.line_num, str(error)))
+                continue
+            if len(batch) == batch_size:
+                if progress is not None:
+                    progress.read = file.buffer.tell()
+                yield batch
+                batch = []
+    if batch:
+        yield batch
+
+
+def decimal_column(values):
+    """returns the values scaled by 10 ** digits as integers of the smallest type, for the fewest digits up to
+    DECIMAL_DIGITS that gives them back exactly, along with the digits. values no such scale gives back are returned
+    as float64 with 0 digits"""
+    values = np.asarray(values, dtype=np.float64)
+    if not len(values):
+        return values.astype(np.uint8), 0
+    if np.isfinite(values).all():
+        for digits in range(DECIMAL_DIGITS + 1):
+            scaled = np.round(values * 10 ** digits)
+            if np.array_equal(scaled / 10 ** digits, values) and np.abs(scaled).max() < 2 ** 63:
+                return scaled.astype(np.result_type(np.min_scalar_type(int(scaled.min())),
+                                                    np.min_scalar_type(int(scaled.max())))), digits
+    return values, 0
+
+
+def transcript_records(courses):
+    """returns the courses as a record array of id (as TRANSCRIPT_ENCODING bytes), points, grade (0 if binary) and the
+    codes of the binary grade text (-1 if numeric) and of the category, along with the names of the courses, the list
+    of strings the codes refer to and the decimal digits of the points and the grades (see decimal_column). the
+    numbers and the codes take the smallest integer type that holds them"""
+    codes = {}
+    courses = list(courses.courses)
+    ids = [c.id.encode(TRANSCRIPT_ENCODING) for c in courses]
+    points, points_digits = decimal_column([c.points for c in courses])
+    grades, grade_digits = decimal_column([0 if c.is_binary else float(c.grade) for c in courses])
+    texts = [codes.setdefault(str(c.grade), len(codes)) if c.is_binary else -1 for c in courses]
+    categories = [codes.setdefault(c.category, len(codes)) for c in courses]
+    code_type = np.min_scalar_type(-max(len(codes), 1))
+    id_width = max([len(id) for id in ids], default=0) or 1
+    records = np.empty(len(courses), dtype=[('id', f'S{id_width}'), ('points', points.dtype),
+                                            ('grade', grades.dtype), ('grade_text', code_type),
+                                            ('category', code_type)])
+    for field, column in zip(records.dtype.names, (ids, points, grades, texts, categories)):
+        records[field] = column
+    return records, [c.name for c in courses], list(codes), np.array([points_digits, grade_digits], dtype=np.uint8)
+
+
+def pack_strings(strings: list):
+    """returns the offsets and the TRANSCRIPT_ENCODING bytes of a list of strings, as NumPy arrays. string i is
+    bytes[offsets[i]:offsets[i + 1]]"""
+    encoded = [string.encode(TRANSCRIPT_ENCODING) for string in strings]
+    offsets = np.cumsum([0] + [len(string) for string in encoded])
+    return offsets.astype(np.min_scalar_type(offsets[-1])), np.frombuffer(b''.join(encoded), dtype=np.uint8)
+
+
+def unpack_strings(offsets, data):
+    """returns the list of strings packed by pack_strings"""
+    data = data.tobytes()
+    offsets = offsets.tolist()
+    return [data[start:stop].decode(TRANSCRIPT_ENCODING) for start, stop in zip(offsets, offsets[1:])]
+
+
+def read_transcript_records(filename: str):
+    """returns the record array of a binary transcript, memory-mapped, its decoded ids, points and grades, its names
+    and its list of strings"""
+    with open(filename, 'rb') as file:
+        version = np.lib.format.read_magic(file)
+        read_header = np.lib.format.read_array_header_1_0 if version == (1, 0) else \
+            np.lib.format.read_array_header_2_0
+        shape, _, dtype = read_header(file)
+        offset = file.tell()
+        if shape[0]:
+            records = np.memmap(filename, dtype=dtype, mode='r', offset=offset, shape=shape)
+        else:
+            records = np.zeros(shape, dtype=dtype)
+        file.seek(offset + records.nbytes)
+        names, strings = [unpack_strings(np.load(file, allow_pickle=False), np.load(file, allow_pickle=False))
+                          for _ in range(2)]
+        points_digits, grade_digits = np.load(file, allow_pickle=False).tolist()
+    return (records, np.char.decode(records['id'], TRANSCRIPT_ENCODING), records['points'] / 10.0 ** points_digits,
+            records['grade'] / 10.0 ** grade_digits, names, strings)
+
+
+def file_token(filename: str):
+    """returns the SHA-1 of the content of a file, which tells the versions of a transcript file apart"""
+    digest = hashlib.sha1()
+    with open(filename, 'rb') as file:
+        for block in iter(lambda: file.read(2 ** 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def journal_token(journal: str):
+    """returns the file_token in the header of a journal, or None if it has no header"""
+    with open(journal, 'r', newline='', encoding=TRANSCRIPT_ENCODING) as file:
+        header = file.readline()
+    return header[len(JOURNAL_HEADER):-1] if header.startswith(JOURNAL_HEADER) and header.endswith('\n') else None
+
+
+def save_courses(courses, filename: str, replacing=None):
+    """writes the courses to a transcript file. a filename ending with BINARY_EXTENSION gets the binary format: the
+    record array of transcript_records followed by its names and its strings as packed by pack_strings and by its
+    decimal digits, all as NumPy arrays. other files get CSV lines.
+    the file is written to a temporary file that then replaces it, so a crash never leaves it half written. the
+    replaced file keeps its permissions, a new one gets the default ones. replacing, if given, is called with the
+    name of the temporary file once it is written, right before it replaces the file"""
+    directory, name = os.path.split(os.path.abspath(filename))
+    descriptor, temporary = tempfile.mkstemp(suffix=os.path.splitext(name)[1], prefix=name, dir=directory)
+    try:
+        if os.path.exists(filename):
+            shutil.copymode(filename, temporary)
+        else:  # mkstemp makes the file private
+            umask = os.umask(0)
+            os.umask(umask)
+            os.chmod(temporary, 0o666 & ~umask)
+        with open(descriptor, 'wb') as file:
+            if filename.endswith(BINARY_EXTENSION):
+                records, names, strings, digits = transcript_records(courses)
+                np.save(file, records, allow_pickle=False)
+                for array in pack_strings(names) + pack_strings(strings) + (digits,):
+                    np.save(file, array, allow_pickle=False)
+            else:
+                file.write('\n'.join(str(course) for course in courses.courses).encode(TRANSCRIPT_ENCODING))
+            file.flush()
+            os.fsync(file.fileno())
+        if replacing is not None:
+            replacing(temporary)
+        os.replace(temporary, filename)
+    except BaseException:
+        os.remove(temporary)
+        raise
+
+
+def save_changes(courses, filename: str):
+    """saves courses to a transcript file by appending the courses changed since the last save to its journal.
+    the file is rewritten instead (and the journal deleted) if the courses don't come from it, or once the journal
+    holds COMPACT_ENTRIES changes. returns whether the file was rewritten.
+    a journal starts with the file_token of the version of the file it extends, so a journal left by a crash right
+    after the file was rewritten is not replayed on the new version. if the rewritten file is the same as the one the
+    journal extends, the journal is deleted before the file is replaced instead"""
+    journal = filename + JOURNAL_SUFFIX
+    if courses.source != filename or not os.path.exists(filename) or \
+            courses.journal_entries + len(courses.changed) >= COMPACT_ENTRIES:
+        def drop_journal(temporary):
+            if os.path.exists(journal) and journal_token(journal) == file_token(temporary):
+                os.remove(journal)
+        save_courses(courses, filename, drop_journal)
+        if os.path.exists(journal):
+            os.remove(journal)
+        courses.source, courses.journal_entries = filename, 0
+        courses.changed.clear()
+        return True
+    if courses.changed:
+        courses_of = [(id, courses.course_of(id)) for id in courses.changed]
+        lines = [f'+,{course}\n' if course else f'-,{id}\n' for id, course in courses_of]
+        new = not courses.journal_entries or not os.path.exists(journal)  # stale journals are overwritten
+        header = f'{JOURNAL_HEADER}{file_token(filename)}\n' if new else ''
+        with open(journal, 'w' if new else 'a', encoding=TRANSCRIPT_ENCODING) as file:
+            file.write(header + ''.join(lines))
+            file.flush()
+            os.fsync(file.fileno())
+        courses.journal_entries += len(lines)
+        if profiling.enabled:
+            profiling.count('journal entries saved', len(lines))
+        courses.changed.clear()
+    return False
+
+
+def replay_journal(filename: str, courses, errors: list):
+    """applies the changes in the journal of a transcript file to courses, appending its malformed lines to errors.
+    a last line without a newline was cut by a crash while it was written, and is ignored. a journal that doesn't
+    extend the current version of the file (see save_changes) is ignored as a whole. returns the amount of changes
+    applied"""
+    journal = filename + JOURNAL_SUFFIX
+    if not os.path.exists(journal):
+        return 0
+    with open(journal, 'r', newline='', encoding=TRANSCRIPT_ENCODING) as file:
+        lines = file.read().split('\n')[:-1]
+    if not lines:
+        return 0
+    if lines[0] != JOURNAL_HEADER + file_token(filename):
+        errors.append((1, f'{os.path.basename(journal)}: written for another version of the file, ignored'))
+        return 0
+    applied = 0
+    for number, row in enumerate(csv.reader(lines[1:]), 2):
+        try:
+            if row[:1] == ['+']:
+                courses.add_course(parse_course(row[1:]), update=False)
+            elif row[:1] == ['-'] and len(row) == 2:
+                courses.remove_course(Course(row[1], '', 0, 0, ''))  # removed by its id
+            else:
+                raise ValueError('expected a line starting with + or -')
+        except ValueError as error:
+            errors.append((number, f'{os.path.basename(journal)}: {error}'))
+            continue
+        applied += 1
+    if profiling.enabled:
+        profiling.count('journal entries replayed', applied)
+    courses.update_avg()
+    courses.update_sd()
+    return applied
+
+
+def load_binary(filename: str, courses=None):
+    """reads a binary transcript into courses (or a new Courses). the records are memory-mapped and read column by
+    column, without parsing"""
+    if courses is None:
+        courses = Courses()
+    records, ids, points, grades, names, strings = read_transcript_records(filename)
+    if profiling.enabled:
+        profiling.count('rows mapped', len(records))
+    if isinstance(courses, ColumnarCourses):
+        courses.add_records(records, ids, points, grades, names, strings)
+        return courses
+    ids, points, grades = ids.tolist(), points.tolist(), grades.tolist()
+    texts, categories = [[strings[code] for code in records[field].tolist()] if strings else []
+                         for field in ('grade_text', 'category')]
+    texts = [text if code >= 0 else grade for text, code, grade in zip(texts, records['grade_text'].tolist(), grades)]
+    courses.add_courses(Course(*row) for row in zip(ids, names, points, texts, categories))
+    return courses
+
+
+def convert_transcript(source: str, destination: str):
+    """converts a transcript between CSV and the binary format, by the extensions of the filenames. returns the
+    malformed lines of the source as (line number, reason)"""
+    courses, errors = load_courses(source)
+    save_courses(courses, destination)
+    return errors
+
+
+def load_courses(filename: str, courses=None, progress=None):
+    """reads a transcript CSV file (or a binary one, by the extension) and the changes saved to its journal into
+    courses (or a new Courses) and returns it with the list of the malformed lines as (line number, reason). courses
+    is only changed once the whole file was read. the reading is reported to progress (a LoadProgress) if given"""
+    if courses is None:
+        courses = Courses()
+    empty = not courses.course_count()
+    errors = []
+    if progress is not None:
+        progress.size = os.path.getsize(filename)
+    if filename.endswith(BINARY_EXTENSION):
+        load_binary(filename, courses)
+    else:
+        try:
+            batches = list(iter_course_batches(filename, errors, progress=progress))
+        except UnicodeDecodeError:  # written in the encoding of the system by an older version
+            errors.clear()
+            batches = list(iter_course_batches(filename, errors, progress=progress, encoding=LEGACY_ENCODING))
+        if profiling.enabled:
+            profiling.count('rows parsed', sum(len(batch) for batch in batches))
+            profiling.count('malformed lines', len(errors))
+        courses.add_courses(course for batch in batches for course in batch)
+    journal_entries = replay_journal(filename, courses, errors)
+    if empty:  # the courses are now the content of the file, later changes are saved to it incrementally
+        courses.source, courses.journal_entries = filename, journal_entries
+        courses.changed.clear()
+    if progress is not None:
+        progress.read = progress.size
+    return courses, errors
+
+
+def write_best_options(courses, combinations, file):
+    """writes combinations of courses as lines of 'average: name, name, ...' to an open text file"""
+    for ids, avg in combinations:
+        file.write(str(avg) + ': ')
+        file.write(', '.join(courses.name_of(id) for id in ids))
+        file.write('\n')
+
+
+class ResultsCache:
+    """LRU cache of best average results, keyed by (fingerprint of the choice courses, points target, match mode).
+    each entry is the list of results and whether it holds all of them. with a directory, the entries are also
+    kept there as JSON files and survive between runs"""
+    def __init__(self, size: int = CACHE_SIZE, directory=None):
+        self.size = size
+        self.directory = directory
+        self.entries = OrderedDict()
+
+    def path(self, key):
+        """returns the file of an entry in the directory"""
+        return os.path.join(self.directory, hashlib.sha1(repr(key).encode()).hexdigest() + '.json')
+
+    def get(self, key):
+        """returns (results, complete) of a key, or None if it isn't cached"""
+        if key in self.entries:
+            self.entries.move_to_end(key)
+            return self.entries[key]
+        if self.directory and os.path.exists(self.path(key)):
+            with open(self.path(key), 'r') as file:
+                stored = json.load(file)
+            entry = [(tuple(ids), avg) for ids, avg in stored['results']], stored['complete']
+            self.put(key, *entry, store=False)
+            return entry
+        return None
+
+    def put(self, key, results: list, complete: bool, store: bool = True):
+        """caches the results of a key, evicting the least recently used entry if the cache is full"""
+        self.entries[key] = results, complete
+        self.entries.move_to_end(key)
+        if len(self.entries) > self.size:
+            self.entries.popitem(last=False)
+        if store and self.directory:  # written aside and renamed, so other processes never read half of it
+            os.makedirs(self.directory, exist_ok=True)
+            descriptor, temporary = tempfile.mkstemp(suffix='.json', dir=self.directory)
+            try:
+                with open(descriptor, 'w') as file:
+                    json.dump({'results': results, 'complete': complete}, file)
+                os.replace(temporary, self.path(key))
+            except BaseException:
+                os.remove(temporary)
+                raise
+
+    def discard(self, fingerprint: str):
+        """forgets the in-memory entries of a set of choice courses that changed"""
+        for key in [key for key in self.entries if key[0] == fingerprint]:
+            self.entries.pop(key)
+
+
+results_cache = ResultsCache()
+
+
+class SearchProgress:
+    """progress of a best average search that runs in another thread: the subsets evaluated so far and the best
+    average found so far. cancel() makes the search stop at its next step"""
+    def __init__(self):
+        self.evaluated = 0
+        self.best = None
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+
+class LoadProgress:
+    """progress of a transcript file read in another thread: its size and the bytes read so far, both 0 until the
+    reading starts"""
+    def __init__(self):
+        self.size = 0
+        self.read = 0
+
+
+class Course:
+    """class that stores a data of a single course"""
+    __slots__ = ('name', 'id', 'grade', 'points', 'category', 'relative_grade', 'is_binary')
+
+    def __init__(self, id, name: str, points: float, grade: int or str, category: str):
+        self.name = name
+        self.id = id
+        self.grade = grade
+        self.points = float(points)
+        self.category = category
+        try:
+            grade = float(grade)
+            self.relative_grade = points * grade
+            self.is_binary = False
+        except ValueError:
+            self.is_binary = True
+            self.relative_grade = None
+
+    def __str__(self):
+        return f'{self.id},{self.name},{self.points},{self.grade},{self.category}'
+
+
+class Courses:
+    """class that if a collection of courses of type Course and their manipulations"""
+    def __init__(self):
+        self.category_counter = {}
+        self.total_points = 0
+        self.points_without_binary = 0
+        self.total_relative_grades = 0
+        self.total_squared_deviations = 0  # sum of points * (grade - GRADE_PIVOT) ** 2
+        self.avg = 0
+        self.sd = 0
+        self.final_points_amount = None
+        self.points_match = MATCH_EXACT  # how the points of a combination match final_points_amount
+        self.points_tolerance = 0  # points a combination may be off by, in MATCH_TOLERANCE mode
+        self.courses = {}
+        self.by_id = {}  # course id -> Course
+        self.points_by_id = {}
+        self.relative_grades_by_id = {}  # only for courses with a numeric grade
+        self.choice_courses = set()
+        self.non_choice_courses = 0
+        self.choice_fingerprint = None  # computed when needed by fingerprint()
+        self.changed = set()  # ids of the courses added, replaced or removed since the last save
+        self.source = None  # transcript file the courses were last loaded from or saved to
+        self.journal_entries = 0  # changes appended to the journal of the source since it was last rewritten
+
+    def set_final_points_amount(self, amount: float, match: str = MATCH_EXACT, tolerance: float = 0):
+        """sets the points the combinations of choice courses should sum up to, and how they match them (one of
+        MATCH_MODES)"""
+        if match not in MATCH_MODES:
+            raise ValueError(f'unknown points match: {match}')
+        self.final_points_amount = amount
+        self.points_match = match
+        self.points_tolerance = tolerance if match == MATCH_TOLERANCE else 0
+        return self.final_points_amount
+
+    def add_course(self, course: Course, update: bool = True):
+        """adds a course, replacing the course with the same id if there is one. the average and the standard
+        deviation are updated unless update is False"""
+        if course.id in self.by_id:
+            self.remove_course(self.by_id[course.id])
+        if course.category == CHOICE:
+            self.invalidate_results()
+        self.changed.add(course.id)
+        if not course.is_binary:
+            self.courses[course] = False
+            self.points_without_binary += course.points
+            self.total_relative_grades += course.relative_grade
+            self.total_squared_deviations += course.points * (float(course.grade) - GRADE_PIVOT) ** 2
+            self.relative_grades_by_id[course.id] = course.relative_grade
+        else:
+            self.courses[course] = True
+        self.by_id[course.id] = course
+        self.points_by_id[course.id] = course.points
+        if course.category == CHOICE:
+            self.choice_courses.add(course.id)
+        else:
+            self.non_choice_courses += course.points
+        if course.category not in self.category_counter:
+            self.category_counter[course.category] = course.points
+        else:
+            self.category_counter[course.category] += course.points
+        self.total_points += course.points
+        if update:
+            self.update_avg()
+            self.update_sd()
+
+    def add_courses(self, courses):
+        """adds many courses, updating the average and the standard deviation once at the end"""
+        for course in courses:
+            self.add_course(course, update=False)
+        self.update_avg()
+        self.update_sd()
+
+    def remove_course(self, course: Course):
+        """removes a course (by its id)"""
+        course = self.by_id.pop(course.id, None)
+        if course is None:
+            return
+        self.changed.add(course.id)
+        if course.id in self.choice_courses:
+            self.invalidate_results()
+        if not self.courses.pop(course):
+            self.total_relative_grades -= course.relative_grade
+            self.total_squared_deviations -= course.points * (float(course.grade) - GRADE_PIVOT) ** 2
+            self.points_without_binary -= course.points
+            self.relative_grades_by_id.pop(course.id)
+            if not self.relative_grades_by_id:  # drops the rounding errors left by the subtractions
+                self.total_relative_grades = self.total_squared_deviations = self.points_without_binary = 0
+        self.points_by_id.pop(course.id)
+        if course.id in self.choice_courses:
+            self.choice_courses.remove(course.id)
+        else:
+            self.non_choice_courses -= course.points
+        self.total_points -= course.points
+        self.category_counter[course.category] -= course.points
+        self.update_avg()
+        self.update_sd()
+
+    def update_avg(self):
+        """updates the average"""
+        try:
+            self.avg = self.total_relative_grades / self.points_without_binary
+        except ZeroDivisionError:
+            self.avg = 0
+
+    def update_sd(self):
+        """updates the standard deviation from the running sums, in constant time"""
+        try:
+            variance = self.total_squared_deviations / self.points_without_binary - (self.avg - GRADE_PIVOT) ** 2
+            self.sd = max(variance, 0) ** 0.5
+        except ZeroDivisionError:
+            self.sd = 0
+
+    def __str__(self):
+        if not self.courses:
+            return str()
+        lines = [f'{c.id}\t{c.points}\t{c.grade}\t{c.name}\n' for c in self.courses]
+        return 'id\tpts\tgrade\tname\n' + ''.join(lines)
+
+    def avg_calc(self, id_lst):
+        """calculates the average of a given list of courses (their id)"""
+        points_sum, grades_sum = 0, 0
+        for id in id_lst:
+            if id in self.relative_grades_by_id:
+                points_sum += self.points_by_id[id]
+                grades_sum += self.relative_grades_by_id[id]
+        if not points_sum:
+            return 0
+        return grades_sum/points_sum
+
+    def sum_points(self, id_lst):
+        """calculates the sum of points of a given list of courses (their id)"""
+        return sum(self.points_by_id.get(id, 0) for id in set(id_lst))
+
+    def fingerprint(self):
+        """returns a hash of the choice courses (ids, points and grades), the part of the courses that best_avg
+        depends on"""
+        if self.choice_fingerprint is None:
+            items = sorted((id, points, relative) for id, points, relative in self.choice_items())
+            self.choice_fingerprint = hashlib.sha1(repr(items).encode()).hexdigest()
+        return self.choice_fingerprint
+
+    def invalidate_results(self):
+        """drops the cached best average results of the current choice courses, which are about to change"""
+        if self.choice_fingerprint is not None:
+            results_cache.discard(self.choice_fingerprint)
+            self.choice_fingerprint = None
+
+    def results_key(self):
+        """returns the key of the best combinations of the current choice courses and points target in the cache"""
+        return self.fingerprint(), self.final_points_amount, (self.points_match, self.points_tolerance)
+
+    def target_range(self, items):
+        """returns the points scale of the choice items (id, points, relative grade) and the range of scaled sums
+        (lowest, highest) that match final_points_amount, or None if no combination of the items does"""
+        scale = points_scale([self.final_points_amount, self.points_tolerance] + [points for _, points, _ in items])
+        target = round(self.final_points_amount * scale)
+        tolerance = round(self.points_tolerance * scale)
+        scaled = [round(points * scale) for _, points, _ in items]
+        if self.points_match == MATCH_AT_LEAST:  # some sum below target + the most points of a course reaches it
+            lowest, highest = max(target, 1), max(target, 1) + max(scaled, default=0)
+        else:
+            lowest, highest = max(target - tolerance, 1), target + tolerance
+        mask = (1 << (highest + 1)) - 1
+        reach = 1  # bitset of the sums of the subsets, the empty one included
+        for points in scaled:
+            reach |= (reach << points) & mask
+        reach &= ~1
+        if not has_bit_between(reach, lowest, highest):
+            return None
+        if self.points_match == MATCH_AT_LEAST:
+            above = reach >> lowest
+            lowest = highest = lowest + (above & -above).bit_length() - 1
+        return scale, lowest, highest
+
+    def cached_results(self, limit=None):
+        """returns the cached best combinations for final_points_amount (the first `limit` of them if given), or
+        None if not enough of them were cached"""
+        cached = results_cache.get(self.results_key())
+        if cached is None:
+            return None
+        results, complete = cached
+        if complete or (limit is not None and len(results) >= limit):
+            return results[:limit]
+        return None
+
+    def best_avg(self, limit=None, workers=None):
+        """creates a list of the best combinations of courses to yield a given amount of points (the first `limit`
+        of them if given), sorted by average from highest to lowest. the points match the amount as set by
+        set_final_points_amount, and the list is empty if no combination does. `workers` processes share the
+        enumeration of the subsets, which is only done up to EXHAUSTIVE_CHOICE_COURSES choice courses: above that
+        the search runs in this process and `workers` is rejected. results are cached until the choice courses
+        change"""
+        if workers and len(self.choice_courses) > EXHAUSTIVE_CHOICE_COURSES:
+            raise ValueError(f'workers need at most {EXHAUSTIVE_CHOICE_COURSES} choice courses, '
+                             f'got {len(self.choice_courses)}')
+        if not self.final_points_amount:
+            return
+        results = self.cached_results(limit)
+        if results is not None:
+            return results
+        if (limit is None or workers) and len(self.choice_courses) <= EXHAUSTIVE_CHOICE_COURSES:
+            results = self.exhaustive_combinations(limit, workers)
+        else:
+            results = list(self.search_combinations(limit))
+        self.cache_results(list(results), limit is None or len(results) < limit)
+        return results
+
+    def cache_results(self, results: list, complete: bool, key=None):
+        """caches best combinations for final_points_amount (under key if given, the results_key they were found
+        for), unless more of them are cached already"""
+        key = key or self.results_key()
+        cached = results_cache.get(key)
+        if cached is None or (not cached[1] and (complete or len(results) > len(cached[0]))):
+            results_cache.put(key, results, complete)
+
+    def best_avg_with_quotas(self, quotas: dict, min_total: float = 0, max_total=None):
+        """finds the combination of courses, out of every category, with the highest average such that the points
+        taken from each category are within its (min, max) in quotas (None for no limit, categories without a
+        quota are not limited) and the total points are within min_total and max_total. returns (ids, average),
+        or None if no combination meets the quotas.
+        the average is maximized by Dinkelbach's method: each round maximizes the sum of points * (grade - best
+        average so far) with a knapsack over the points of each category and a max-plus merge of the categories
+        over the total points, until no combination beats the best average"""
+        groups = self.category_items()
+        if any(low for category, (low, _) in quotas.items() if low and category not in groups):
+            return None
+        scale = points_scale([points for items in groups.values() for _, points, _ in items])
+        total_cap = sum(round(points * scale) for items in groups.values() for _, points, _ in items)
+        if max_total is not None:
+            total_cap = min(total_cap, math.floor(max_total * scale + 1e-9))
+        categories = []  # (items, lowest and highest scaled points)
+        for category, items in groups.items():
+            low, high = quotas.get(category, (None, None))
+            items = [(id, round(points * scale), 0.0 if relative is None else points, relative)
+                     for id, points, relative in items]
+            cap = min(sum(scaled for _, scaled, _, _ in items), total_cap)
+            if high is not None:
+                cap = min(cap, math.floor(high * scale + 1e-9))
+            categories.append((items, math.ceil((low or 0) * scale - 1e-9), cap))
+        if any(low > cap for _, low, cap in categories):
+            return None
+        best, ratio = None, 0.0
+        while True:
+            tables, total, splits = [], np.full(total_cap + 1, -np.inf), []
+            total[0] = 0
+            for items, low, cap in categories:
+                values, taken = category_table(items, cap, ratio)
+                values[:low] = -np.inf
+                tables.append(taken)
+                total, split = max_plus_merge(total, values)
+                splits.append(split)
+            lowest = max(math.ceil(min_total * scale - 1e-9), 0)
+            if lowest > total_cap or not np.isfinite(total[lowest:]).any():
+                return None
+            amount = lowest + int(np.argmax(total[lowest:]))
+            if best is not None and total[amount] <= 1e-9:
+                return best
+            chosen = []
+            for (items, _, _), taken, split in zip(reversed(categories), reversed(tables), reversed(splits)):
+                taken_amount = int(split[amount])
+                amount -= taken_amount
+                for k in reversed(range(len(items))):
+                    if taken[k, taken_amount]:
+                        chosen.append(items[k])
+                        taken_amount -= items[k][1]
+            points_sum = sum(points for _, _, points, _ in chosen)
+            grades_sum = sum(relative or 0.0 for _, _, _, relative in chosen)
+            new_ratio = grades_sum / points_sum if points_sum else 0.0
+            if best is not None and new_ratio <= ratio:
+                return best
+            best, ratio = (tuple(id for id, _, _, _ in reversed(chosen)), new_ratio), new_ratio
+
+    def best_avg_sweep(self):
+        """returns (points, best average, ids) for every amount of points a combination of choice courses sums up
+        to, by increasing points: the best average of each final_points_amount at once.
+        one dynamic programming pass over the choice courses keeps the highest sum of relative grades of every
+        (total points, graded points) pair, and remembers which course improved each pair to rebuild the
+        combinations. the best average of a total is the best ratio in its row"""
+        items = self.choice_items()
+        if not items:
+            return []
+        scale = points_scale([points for _, points, _ in items])
+        totals = [round(points * scale) for _, points, _ in items]
+        graded = [0 if relative is None else total for (_, _, relative), total in zip(items, totals)]
+        total_step, graded_step = math.gcd(*totals) or 1, math.gcd(*graded) or 1  # the sums are multiples of them
+        totals = [total // total_step for total in totals]
+        graded = [points // graded_step for points in graded]
+        rows, columns = sum(totals) + 1, sum(graded) + 1
+        if len(items) * rows * columns > SWEEP_CELLS:
+            raise ValueError(f'too many choice points to sweep ({rows - 1} x {columns - 1})')
+        best = np.full((rows, columns), -np.inf)
+        best[0, 0] = 0.0
+        taken = []  # per course, the packed bits of the pairs it improved
+        top_row, top_column = 0, 0  # the pairs beyond them are not reachable yet
+        for (_, _, relative), total, points in zip(items, totals, graded):
+            top_row, top_column = top_row + total, top_column + points
+            region = best[total:top_row + 1, points:top_column + 1]
+            candidate = best[:top_row + 1 - total, :top_column + 1 - points] + (relative or 0.0)
+            improved = candidate > region
+            region[improved] = candidate[improved]
+            bits = np.zeros((rows, columns), dtype=bool)
+            bits[total:top_row + 1, points:top_column + 1] = improved
+            taken.append(np.packbits(bits, axis=1))
+        sweep = []
+        graded_points = np.arange(columns) * graded_step / scale
+        for row in range(1, rows):
+            sums = best[row]
+            if not np.isfinite(sums).any():
+                continue
+            averages = np.full(columns, -np.inf)
+            averages[1:] = sums[1:] / graded_points[1:]
+            column = int(np.argmax(averages)) if np.isfinite(averages[1:]).any() else 0
+            chosen, position = [], (row, column)
+            for k in reversed(range(len(items))):
+                r, c = position
+                if taken[k][r, c >> 3] >> (7 - (c & 7)) & 1:
+                    chosen.append(items[k][0])
+                    position = (r - totals[k], c - graded[k])
+            combination = tuple(reversed(chosen))
+            sweep.append((row * total_step / scale, self.avg_calc(combination), combination))
+        return sweep
+
+    def exhaustive_combinations(self, limit=None, workers=None):
+        """evaluates every subset of the choice courses in NumPy batches and returns the ones that match
+        final_points_amount, sorted by average from highest to lowest (the first `limit` of them if given).
+        the subsets of the first HALF_BITS courses and of the rest are tabulated once, then every pair of them is
+        checked by broadcasting. with `workers`, the subsets of the rest are split between that many processes"""
+        items = sorted(self.choice_items())  # by id, so tied combinations come in the same order in every process
+        ids = [id for id, _, _ in items]
+        matching = self.target_range(items)
+        if matching is None:
+            return []
+        scale, lowest, highest = matching
+        scaled = np.array([round(points * scale) for _, points, _ in items], dtype=np.int64)
+        graded = np.array([0.0 if relative is None else points for _, points, relative in items])
+        relative = np.array([relative or 0.0 for _, _, relative in items])
+        low_bits = min(len(items), HALF_BITS)
+        low = [subset_sums(column[:low_bits]) for column in (scaled, graded, relative)]
+        high = [subset_sums(column[low_bits:]) for column in (scaled, graded, relative)]
+        if workers:
+            bounds = np.linspace(0, len(high[0]), WORKER_TASKS * workers + 1).astype(int).tolist()
+            with ProcessPoolExecutor(workers, initializer=share_tables,
+                                     initargs=(low, high, (lowest, highest))) as executor:
+                parts = list(executor.map(match_shared_subsets, bounds[:-1], bounds[1:], repeat(limit)))
+        else:
+            parts = [match_subsets(low, high, (lowest, highest), 0, len(high[0]), limit)]
+        high_rows, low_rows, averages = [np.concatenate(column) for column in zip(*parts)]
+        if profiling.enabled:
+            profiling.count('subsets evaluated', len(low[0]) * len(high[0]))
+        order = np.argsort(-averages, kind='stable')[:limit]  # the parts are merged in the order of a single run
+        low_ids = subset_ids(ids[:low_bits])
+        high_ids = subset_ids(ids[low_bits:])
+        collecting = gc.isenabled()
+        gc.disable()  # the tuples of ids hold no cycles, collecting while they are made only slows it down
+        try:
+            return [(high_ids[high_row] + low_ids[low_row], avg) for high_row, low_row, avg in
+                    zip(high_rows[order].tolist(), low_rows[order].tolist(), averages[order].tolist())]
+        finally:
+            if collecting:
+                gc.enable()
+
+    def ranked_combinations(self, limit=None, progress=None):
+        """yields the combinations of choice courses that match final_points_amount, best average first, and
+        stops after `limit` of them if given. nothing is computed before the next combination is asked for.
+        cached combinations are yielded first, then the search goes on, skipping the combinations the cache holds
+        (it may have been filled by the other engine, or in another order of tied combinations). the search reports
+        to progress (a SearchProgress) if given, and stops once it is cancelled. the combinations are cached under the
+        results_key of when the first one was asked for, even if the courses or the target change in the meantime"""
+        key = self.results_key()
+        cached = results_cache.get(key)
+        results, complete = cached if cached else ([], False)
+        if complete or (limit is not None and len(results) >= limit):
+            yield from results[:limit]
+            return
+        search = self.search_combinations(None, progress)  # for the same courses and target as the key
+        yield from results
+        results = list(results)
+        cached_ids = {frozenset(ids) for ids, _ in results}
+        try:
+            for combination in search:
+                if frozenset(combination[0]) in cached_ids:
+                    continue
+                results.append(combination)
+                yield combination
+                if limit is not None and len(results) >= limit:
+                    break
+            cancelled = progress is not None and progress.cancelled
+            complete = not cancelled and (limit is None or len(results) < limit)
+        finally:  # also when the caller stops asking for combinations
+            self.cache_results(results, complete, key)
+
+    def search_combinations(self, limit=None, progress=None):
+        """the best-first search behind ranked_combinations (see best_first_search). the choice courses and the target
+        are read when it is called, and the combinations are found as they are asked for"""
+        choice_items = self.choice_items()
+        return best_first_search(choice_items, self.target_range(choice_items), limit, progress)
+
+    def name_of(self, id):
+        """returns the name of the course with the given id"""
+        return self.by_id[id].name
+
+    def category_items(self):
+        """returns the (id, points, relative grade or None if binary) of the courses of each category"""
+        items = {}
+        for course in self.courses:
+            items.setdefault(course.category, []).append((course.id, course.points, course.relative_grade))
+        return items
+
+    def course_values(self, id):
+        """returns the points and the grade (None if binary) of the course with the given id, or None if there is
+        no such course"""
+        course = self.by_id.get(id)
+        if course is None:
+            return None
+        return course.points, None if course.is_binary else float(course.grade)
+
+    def what_if(self, course: Course = None, removed_id=None):
+        """returns the average and the standard deviation there would be if course was added (replacing the course
+        with its id) and the course with removed_id was removed, in constant time and without changing anything"""
+        points, grades, squares = self.points_without_binary, self.total_relative_grades, \
+            self.total_squared_deviations
+        for id in {removed_id, course.id if course else None} - {None}:
+            values = self.course_values(id)
+            if values and values[1] is not None:
+                points -= values[0]
+                grades -= values[0] * values[1]
+                squares -= values[0] * (values[1] - GRADE_PIVOT) ** 2
+        if course and not course.is_binary:
+            points += course.points
+            grades += course.points * float(course.grade)
+            squares += course.points * (float(course.grade) - GRADE_PIVOT) ** 2
+        avg, sd = weighted_stats(points, grades, squares)
+        return float(avg), float(sd)
+
+    def what_if_many(self, ids, grades, points=None):
+        """scores many scenarios at once: in scenario i, the course ids[i] gets grades[i] (NaN for a binary grade)
+        and points[i] points (its current points if not given, required for new courses). returns NumPy arrays of
+        the average and the standard deviation of every scenario"""
+        old = [self.course_values(id) or (np.nan, None) for id in ids]
+        old_points = np.array([values[0] for values in old])
+        old_grades = np.array([np.nan if values[1] is None else values[1] for values in old])
+        new_points = old_points if points is None else np.asarray(points, dtype=float)
+        if np.isnan(new_points).any():
+            raise ValueError('points are needed for courses that are not in the transcript')
+        new_grades = np.asarray(grades, dtype=float)
+        old_graded, new_graded = ~np.isnan(old_grades), ~np.isnan(new_grades)
+        old_points, new_points = np.where(old_graded, old_points, 0.0), np.where(new_graded, new_points, 0.0)
+        old_grades, new_grades = np.nan_to_num(old_grades), np.nan_to_num(new_grades)
+        return weighted_stats(
+            self.points_without_binary - old_points + new_points,
+            self.total_relative_grades - old_points * old_grades + new_points * new_grades,
+            self.total_squared_deviations - old_points * (old_grades - GRADE_PIVOT) ** 2
+            + new_points * (new_grades - GRADE_PIVOT) ** 2)
+
+    def choice_items(self):
+        """returns (id, points, relative grade or None if binary) of every choice course"""
+        return [(id, self.points_by_id[id], self.relative_grades_by_id.get(id)) for id in self.choice_courses]
+
+    def graded_courses(self):
+        """returns the names, grades and points of the courses with a numeric grade"""
+        names, grades, points = [], [], []
+        for course in self.courses:
+            if not self.courses[course]:
+                names.append(course.name)
+                grades.append(float(course.grade))
+                points.append(course.points)
+        return names, grades, points
+
+    def get_avg(self):
+        """returns the standard average"""
+        return round(self.avg, 3)
+
+    def get_sd(self):
+        """returns the standard deviation"""
+        return round(self.sd, 3)
+
+    def copy(self):
+        """creates a copy of the object"""
+        new_object = Courses()
+        for course in self.courses:
+            new_object.add_course(course)
+        new_object.copy_save_state(self)
+        return new_object
+
+    def edit(self):
+        """starts an EditSession over the courses, which changes them only when it is committed"""
+        return EditSession(self)
+
+    def copy_save_state(self, other):
+        """takes the unsaved changes and the source file of another Courses object"""
+        self.changed = set(other.changed)
+        self.source = other.source
+        self.journal_entries = other.journal_entries
+
+    def course_count(self):
+        return len(self.by_id)
+
+    def course_of(self, id):
+        """returns the course with the given id, or None if there is no such course"""
+        return self.by_id.get(id)
+
+
+class EditSession:
+    """edits of a Courses object kept as an overlay until they are committed: nothing is copied when the session
+    starts, commit() applies the edits to the courses at once, which update their aggregates one course at a time,
+    and discard() only drops the overlay. the average and the standard deviation of the edited courses are kept as
+    running sums, like in Courses"""
+    def __init__(self, courses: Courses):
+        self.courses = courses
+        self.added = {}  # course id -> course added or replacing the course with that id
+        self.removed = set()  # ids of courses of self.courses that were removed and not added again
+        self.points_without_binary = 0
+        self.total_relative_grades = 0
+        self.total_squared_deviations = 0
+        self.discard()
+
+    def course_of(self, id):
+        """returns the edited course with the given id, or None if there is no such course"""
+        if id in self.added:
+            return self.added[id]
+        if id in self.removed:
+            return None
+        return self.courses.course_of(id)
+
+    def course_values(self, id):
+        """returns the points and the grade (None if binary) of the edited course with the given id, or None if there
+        is no such course"""
+        course = self.course_of(id)
+        if course is None:
+            return None
+        return course.points, None if course.is_binary else float(course.grade)
+
+    what_if = Courses.what_if  # over the running sums and the course_values of the session
+
+    def change_sums(self, course: Course, sign: int):
+        """adds (sign 1) or subtracts (sign -1) a course to the running sums"""
+        if course is None or course.is_binary:
+            return
+        self.points_without_binary += sign * course.points
+        self.total_relative_grades += sign * course.relative_grade
+        self.total_squared_deviations += sign * course.points * (float(course.grade) - GRADE_PIVOT) ** 2
+
+    def add_course(self, course: Course):
+        """adds a course, replacing the course with the same id if there is one"""
+        self.change_sums(self.course_of(course.id), -1)
+        self.change_sums(course, 1)
+        self.added[course.id] = course
+        self.removed.discard(course.id)
+
+    def remove_course(self, course: Course):
+        """removes a course (by its id)"""
+        course = self.course_of(course.id)
+        if course is None:
+            return
+        self.change_sums(course, -1)
+        self.added.pop(course.id, None)
+        if self.courses.course_of(course.id) is not None:
+            self.removed.add(course.id)
+
+    def get_avg(self):
+        """returns the standard average of the edited courses"""
+        return round(self.what_if()[0], 3)
+
+    def get_sd(self):
+        """returns the standard deviation of the edited courses"""
+        return round(self.what_if()[1], 3)
+
+    def commit(self):
+        """applies the edits to the courses and starts over from them"""
+        for id in self.removed:
+            self.courses.remove_course(self.courses.course_of(id))
+        self.courses.add_courses(self.added.values())
+        self.discard()
+
+    def discard(self):
+        """drops the edits"""
+        self.added, self.removed = {}, set()
+        self.points_without_binary = self.courses.points_without_binary
+        self.total_relative_grades = self.courses.total_relative_grades
+        self.total_squared_deviations = self.courses.total_squared_deviations
+
+
+class ColumnarCourses(Courses):
+    """collection of courses stored column by column in NumPy arrays, with the same API as Courses.
+    meant for cohort-scale files: names, categories and binary grades are kept once in a string table and every
+    aggregate is a vectorized reduction over the columns"""
+    def __init__(self, capacity: int = 64):
+        self.final_points_amount = None
+        self.points_match = MATCH_EXACT
+        self.points_tolerance = 0
+        self.size = 0
+        self.ids = np.empty(capacity, dtype='U8')
+        self.points = np.zeros(capacity)
+        self.grades = np.zeros(capacity)  # numeric grades, 0 for binary ones
+        self.binary = np.zeros(capacity, dtype=bool)
+        self.name_codes = np.zeros(capacity, dtype=np.int32)
+        self.category_codes = np.zeros(capacity, dtype=np.int32)
+        self.grade_codes = np.zeros(capacity, dtype=np.int32)  # text of the binary grades
+        self.strings = []  # names, categories and binary grades, referred to by their code
+        self.string_codes = {}
+        self.rows = {}  # course id -> row
+        self.choice_fingerprint = None
+        self.changed = set()
+        self.source = None
+        self.journal_entries = 0
+
+    def code(self, string: str):
+        """returns the code of a string in the string table, adding it if needed"""
+        if string not in self.string_codes:
+            self.string_codes[string] = len(self.strings)
+            self.strings.append(string)
+        return self.string_codes[string]
+
+    def columns(self):
+        """returns the names of the array attributes, one per column"""
+        return ['ids', 'points', 'grades', 'binary', 'name_codes', 'category_codes', 'grade_codes']
+
+    def grow(self):
+        """doubles the capacity of the columns"""
+        for column in self.columns():
+            array = getattr(self, column)
+            grown = np.zeros(2 * len(array), dtype=array.dtype)
+            grown[:self.size] = array[:self.size]
+            setattr(self, column, grown)
+
+    def add_course(self, course: Course, update: bool = True):
+        """adds a course, replacing the course with the same id if there is one"""
+        if course.id in self.rows:
+            self.remove_course(course)
+        if course.category == CHOICE:
+            self.invalidate_results()
+        self.changed.add(course.id)
+        if self.size == len(self.points):
+            self.grow()
+        if len(course.id) > self.ids.dtype.itemsize // 4:
+            self.ids = self.ids.astype(f'U{len(course.id)}')
+        row = self.size
+        self.ids[row] = course.id
+        self.points[row] = course.points
+        self.binary[row] = course.is_binary
+        self.grades[row] = 0 if course.is_binary else float(course.grade)
+        self.grade_codes[row] = self.code(str(course.grade)) if course.is_binary else 0
+        self.name_codes[row] = self.code(course.name)
+        self.category_codes[row] = self.code(course.category)
+        self.rows[course.id] = row
+        self.size += 1
+
+    def remove_course(self, course: Course):
+        """removes a course (by its id), moving the last row into its place"""
+        row = self.rows.pop(course.id, None)
+        if row is None:
+            return
+        self.changed.add(course.id)
+        if self.strings[self.category_codes[row]] == CHOICE:
+            self.invalidate_results()
+        self.size -= 1
+        if row != self.size:
+            for column in self.columns():
+                array = getattr(self, column)
+                array[row] = array[self.size]
+            self.rows[str(self.ids[row])] = row
+
+    def add_records(self, records, ids, points, grades, names: list, strings: list):
+        """adds the courses of a binary transcript (see read_transcript_records) with whole-column copies. courses
+        with an id that is already there are replaced one by one"""
+        binary = records['grade_text'] >= 0
+        new = np.array([id not in self.rows for id in ids.tolist()], dtype=bool)
+        for row in np.flatnonzero(~new):
+            record = records[row]
+            grade = strings[record['grade_text']] if binary[row] else float(grades[row])
+            self.add_course(Course(str(ids[row]), names[row], float(points[row]), grade,
+                                   strings[record['category']]))
+        if not new.all():
+            records, ids, points, grades, binary = records[new], ids[new], points[new], grades[new], binary[new]
+            names = [name for name, is_new in zip(names, new.tolist()) if is_new]
+        amount = len(records)
+        if not amount:
+            return
+        table = np.array([self.code(string) for string in strings], dtype=np.int32)
+        if CHOICE in self.string_codes and np.any(table[records['category']] == self.string_codes[CHOICE]):
+            self.invalidate_results()
+        while self.size + amount > len(self.points):
+            self.grow()
+        if ids.dtype.itemsize > self.ids.dtype.itemsize:
+            self.ids = self.ids.astype(ids.dtype)
+        rows = slice(self.size, self.size + amount)
+        self.ids[rows] = ids
+        self.points[rows] = points
+        self.grades[rows] = np.where(binary, 0, grades)
+        self.binary[rows] = binary
+        self.name_codes[rows] = [self.code(name) for name in names]
+        self.category_codes[rows] = table[records['category']]
+        self.grade_codes[rows] = np.where(binary, table[np.maximum(records['grade_text'], 0)], 0)
+        self.rows.update(zip(ids.tolist(), range(self.size, self.size + amount)))
+        self.size += amount
+        self.changed.update(ids.tolist())
+
+    def update_avg(self):
+        """the average is computed on demand"""
+
+    def update_sd(self):
+        """the standard deviation is computed on demand"""
+
+    def graded_mask(self):
+        """returns a mask of the rows with a numeric grade"""
+        return ~self.binary[:self.size]
+
+    @property
+    def total_points(self):
+        return float(self.points[:self.size].sum())
+
+    @property
+    def points_without_binary(self):
+        return float(self.points[:self.size][self.graded_mask()].sum())
+
+    @property
+    def total_relative_grades(self):
+        return float(np.dot(self.points[:self.size], self.grades[:self.size]))  # binary rows have grade 0
+
+    @property
+    def total_squared_deviations(self):
+        mask = self.graded_mask()
+        return float(np.dot(self.points[:self.size][mask], (self.grades[:self.size][mask] - GRADE_PIVOT) ** 2))
+
+    @property
+    def avg(self):
+        points = self.points_without_binary
+        return self.total_relative_grades / points if points else 0
+
+    @property
+    def sd(self):
+        mask = self.graded_mask()
+        points = self.points[:self.size][mask]
+        if not points.sum():
+            return 0
+        deviations = self.grades[:self.size][mask] - self.avg
+        return float(np.dot(points, deviations ** 2) / points.sum()) ** 0.5
+
+    @property
+    def category_counter(self):
+        totals = np.bincount(self.category_codes[:self.size], weights=self.points[:self.size],
+                             minlength=len(self.strings))
+        present = np.unique(self.category_codes[:self.size])
+        return {self.strings[code]: float(totals[code]) for code in present}
+
+    def choice_mask(self):
+        """returns a mask of the rows in the choice category"""
+        if CHOICE not in self.string_codes:
+            return np.zeros(self.size, dtype=bool)
+        return self.category_codes[:self.size] == self.string_codes[CHOICE]
+
+    @property
+    def choice_courses(self):
+        return set(self.ids[:self.size][self.choice_mask()].tolist())
+
+    @property
+    def non_choice_courses(self):
+        return float(self.points[:self.size][~self.choice_mask()].sum())
+
+    def course(self, row: int):
+        """builds the Course object of a row"""
+        grade = self.strings[self.grade_codes[row]] if self.binary[row] else float(self.grades[row])
+        return Course(str(self.ids[row]), self.strings[self.name_codes[row]], float(self.points[row]), grade,
+                      self.strings[self.category_codes[row]])
+
+    @property
+    def courses(self):
+        return {self.course(row): bool(self.binary[row]) for row in range(self.size)}
+
+    @property
+    def by_id(self):
+        return {id: self.course(row) for id, row in self.rows.items()}
+
+    def course_count(self):
+        return self.size
+
+    def course_of(self, id):
+        """returns the course with the given id, or None if there is no such course"""
+        row = self.rows.get(id)
+        return None if row is None else self.course(row)
+
+    def name_of(self, id):
+        """returns the name of the course with the given id"""
+        return self.strings[self.name_codes[self.rows[id]]]
+
+    def course_values(self, id):
+        """returns the points and the grade (None if binary) of the course with the given id, or None if there is
+        no such course"""
+        row = self.rows.get(id)
+        if row is None:
+            return None
+        return float(self.points[row]), None if self.binary[row] else float(self.grades[row])
+
+    def id_rows(self, id_lst):
+        """returns the rows of the given course ids (each id once)"""
+        return np.fromiter({self.rows[id] for id in id_lst if id in self.rows}, dtype=np.int64)
+
+    def avg_calc(self, id_lst):
+        """calculates the average of a given list of courses (their id)"""
+        rows = self.id_rows(id_lst)
+        rows = rows[~self.binary[rows]]
+        points_sum = self.points[rows].sum()
+        if not points_sum:
+            return 0
+        return float(np.dot(self.points[rows], self.grades[rows]) / points_sum)
+
+    def sum_points(self, id_lst):
+        """calculates the sum of points of a given list of courses (their id)"""
+        return float(self.points[self.id_rows(id_lst)].sum())
+
+    def category_items(self):
+        """returns the (id, points, relative grade or None if binary) of the courses of each category"""
+        items = {}
+        for row in range(self.size):
+            relative = None if self.binary[row] else float(self.points[row] * self.grades[row])
+            items.setdefault(self.strings[self.category_codes[row]], []).append(
+                (str(self.ids[row]), float(self.points[row]), relative))
+        return items
+
+    def choice_items(self):
+        """returns (id, points, relative grade or None if binary) of every choice course"""
+        rows = np.flatnonzero(self.choice_mask())
+        return [(str(self.ids[row]), float(self.points[row]),
+                 None if self.binary[row] else float(self.points[row] * self.grades[row])) for row in rows]
+
+    def graded_courses(self):
+        """returns the names, grades and points of the courses with a numeric grade"""
+        mask = self.graded_mask()
+        names = [self.strings[code] for code in self.name_codes[:self.size][mask]]
+        return names, self.grades[:self.size][mask].tolist(), self.points[:self.size][mask].tolist()
+
+    def copy(self):
+        """creates a copy of the object"""
+        new_object = ColumnarCourses(len(self.points))
+        for column in self.columns():
+            setattr(new_object, column, getattr(self, column).copy())
+        new_object.size = self.size
+        new_object.strings = list(self.strings)
+        new_object.string_codes = dict(self.string_codes)
+        new_object.rows = dict(self.rows)
+        new_object.choice_fingerprint = self.choice_fingerprint
+        new_object.copy_save_state(self)
+        return new_object
+
+
+profiling.instrument(sys.modules[__name__], ['load_courses', 'load_binary', 'save_courses', 'save_changes',
+                                             'replay_journal', 'write_best_options'])
+profiling.instrument(Courses, ['add_course', 'add_courses', 'remove_course', 'update_avg', 'update_sd', 'best_avg',
+                               'best_avg_with_quotas', 'best_avg_sweep', 'exhaustive_combinations', 'what_if',
+                               'what_if_many', 'copy'])
+profiling.instrument(ColumnarCourses, ['add_course', 'add_records', 'remove_course', 'copy'])
+profiling.instrument(EditSession, ['add_course', 'remove_course', 'commit'])
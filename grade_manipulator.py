@@ -1,181 +1,172 @@
 import tkinter as tk
-from matplotlib import pyplot as plt
 from tkinter import filedialog as fd
 import tkinter.font as fnt
 from tkinter import messagebox
+from tkinter import ttk
+from bisect import bisect_left, insort
+import math
 import os
-from itertools import combinations
+import queue
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import profiling
+from courses import Course, Courses, MIN_GRADE, MAX_GRADE, SAVED_OPTIONS, TRANSCRIPT_EXTENSIONS, LoadProgress, \
+    SearchProgress, load_courses, parse_points_target, save_changes, write_best_options
 
 
-CHOICE = 'choice'
 GRID_COL = 6
 GRID_ROW = 10
 EDIT_WINDOW_ROW = 11
 EDIT_WINDOW_COL = 4
-MIN_GRADE = 60
-MAX_GRADE = 100
 DEFAULT_TEXT = 'Choice points #'
+SHOWN_ERRORS = 10  # malformed lines listed when opening a file
+POLL_MS = 100  # how often the window checks on a running best average search or on the files being opened
+LOAD_WORKERS = 4  # transcript files read at once when several are opened
+MERGED = 'all opened files'  # the entry of the files list that shows the courses of all the opened files together
+AUTOSAVE_MS = 60000  # how often unsaved changes are saved to the opened file
+TABLE_COLUMNS = {'id': 90, 'pts': 50, 'grade': 60, 'name': 300}  # columns of the courses table and their widths
 
 
-class Course:
-    """class that stores a data of a single course"""
-    def __init__(self, id, name: str, points: float, grade: int or str, category: str):
-        self.name = name
-        self.id = id
-        self.grade = grade
-        self.points = float(points)
-        self.category = category
+def search_worker(combinations, results):
+    """runs in a background thread: puts the combinations found by a best average search in the results queue,
+    followed by None when the search is over"""
+    for combination in combinations:
+        results.put(combination)
+    results.put(None)
+
+
+def best_options_worker(courses, filename: str):
+    """runs in a background thread: writes the best combinations of courses to a best options file, the first
+    SAVED_OPTIONS of them. the ones the search of the window already found are taken from the results cache"""
+    with open(filename, 'w') as file:
+        write_best_options(courses, courses.ranked_combinations(SAVED_OPTIONS), file)
+
+
+def sort_key(column: str, value):
+    """the key a value of the courses table is sorted by: numbers by value, with binary grades ('pass', 'exempt'...)
+    after the numeric ones, by their text"""
+    if column == 'grade':
         try:
-            grade = float(grade)
-            self.relative_grade = points * grade
-            self.is_binary = False
+            return 0, float(value)
         except ValueError:
-            self.is_binary = True
-            self.relative_grade = None
-
-    def __str__(self):
-        return f'{self.id},{self.name},{self.points},{self.grade},{self.category}'
-
-
-class Courses:
-    """class that if a collection of courses of type Course and their manipulations"""
-    def __init__(self):
-        self.category_counter = {}
-        self.total_points = 0
-        self.points_without_binary = 0
-        self.total_relative_grades = 0
-        self.avg = 0
-        self.sd = 0
-        self.final_points_amount = None
-        self.courses = {}
-        self.choice_courses = set()
-        self.non_choice_courses = 0
-
-    def set_final_points_amount(self, amount: int):
-        self.final_points_amount = amount
-        return self.final_points_amount
-
-    def add_course(self, course: Course):
-        """adds a course"""
-        if not course.is_binary:
-            self.courses[course] = False
-            self.points_without_binary += course.points
-            self.total_relative_grades += course.relative_grade
-        else:
-            self.courses[course] = True
-        if course.category == CHOICE:
-            self.choice_courses.add(course.id)
-        else:
-            self.non_choice_courses += course.points
-        if course.category not in self.category_counter:
-            self.category_counter[course.category] = course.points
+            return 1, str(value)
+    if column == 'pts':
+        return float(value)
+    return str(value)
+
+
+class CourseTable:
+    """scrollable courses table. Treeview only draws the visible rows, and the rows are inserted, removed and sorted
+    one by one instead of redrawing the whole table"""
+    def __init__(self, root, height: int):
+        self.frame = tk.Frame(root)
+        self.tree = ttk.Treeview(self.frame, columns=list(TABLE_COLUMNS), show='headings', height=height)
+        for column, width in TABLE_COLUMNS.items():
+            self.tree.heading(column, text=column, command=lambda column=column: self.sort(column))
+            self.tree.column(column, width=width, anchor='w', stretch=column == 'name')
+        self.scrollbar = ttk.Scrollbar(self.frame, orient='vertical', command=self.tree.yview)
+        self.tree.configure(yscrollcommand=self.scrollbar.set)
+        self.tree.pack(side='left', fill='both', expand=True)
+        self.scrollbar.pack(side='right', fill='y')
+        self.rows = {}  # values shown for every course id, the id is the item of its row
+        self.sort_column = None
+        self.descending = False
+        self.keys = []  # ascending (key, id) of the rows by the sort column
+
+    def grid(self, **kwargs):
+        self.frame.grid(**kwargs)
+
+    def key(self, id):
+        """returns the (key, id) the row is kept sorted by"""
+        column = list(TABLE_COLUMNS).index(self.sort_column)
+        return sort_key(self.sort_column, self.rows[id][column]), id
+
+    def insert(self, course: Course):
+        """adds the row of a course, or updates it if the course id is already shown"""
+        values = (course.id, course.points, course.grade, course.name)
+        if self.rows.get(course.id) == values:
+            return
+        if course.id in self.rows:
+            self.delete(course.id)
+        self.rows[course.id] = values
+        if self.sort_column is None:
+            self.tree.insert('', 'end', iid=course.id, values=values)
+            return
+        key = self.key(course.id)
+        index = bisect_left(self.keys, key)
+        self.keys.insert(index, key)
+        position = len(self.keys) - 1 - index if self.descending else index
+        self.tree.insert('', position, iid=course.id, values=values)
+
+    def delete(self, id):
+        """removes the row of a course id, if shown"""
+        if id not in self.rows:
+            return
+        if self.sort_column is not None:
+            del self.keys[bisect_left(self.keys, self.key(id))]
+        del self.rows[id]
+        self.tree.delete(id)
+
+    def sync(self, courses: Courses):
+        """updates the table to show the given courses, touching only the rows that were added, removed or changed"""
+        by_id = courses.by_id
+        for id in [id for id in self.rows if id not in by_id]:
+            self.delete(id)
+        for course in by_id.values():
+            self.insert(course)
+
+    def sort(self, column: str):
+        """sorts the rows by a column, clicking the same column again reverses the order"""
+        self.descending = not self.descending if column == self.sort_column else False
+        self.sort_column = column
+        self.keys = []
+        for id in self.rows:
+            insort(self.keys, self.key(id))
+        ordered = reversed(self.keys) if self.descending else self.keys
+        for index, (_, id) in enumerate(ordered):
+            self.tree.move(id, '', index)
+
+
+class PlotWindow:
+    """window that embeds a plot (see plots.py). closing it hides it, so the figure is kept and updated in place the
+    next time it is shown"""
+    def __init__(self, root, plot, title: str, icon: str):
+        from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+        self.plot = plot
+        self.root = tk.Toplevel(root)
+        self.root.title(title)
+        self.root.iconbitmap(icon)
+        self.root.state('zoomed')
+        self.root.protocol("WM_DELETE_WINDOW", self.root.withdraw)
+        self.canvas = FigureCanvasTkAgg(plot.figure, master=self.root)
+        self.canvas.get_tk_widget().pack(fill='both', expand=True)
+        self.root.withdraw()
+
+    def refresh(self, courses: Courses):
+        """redraws the plot if it is shown and its data changed. a plot left without data is hidden"""
+        if self.root.state() == 'withdrawn':
+            return
+        if self.plot.update(courses):
+            self.canvas.draw_idle()
         else:
-            self.category_counter[course.category] += course.points
-        self.total_points += course.points
-        self.update_avg()
-        self.update_sd()
-
-    def remove_course(self, course: Course):
-        """removes a course"""
-        for c in self.courses:
-            if course.id == c.id:
-                if not self.courses[c]:
-                    self.total_relative_grades -= course.relative_grade
-                    self.points_without_binary -= course.points
-                if course.id in self.choice_courses:
-                    self.choice_courses.remove(course.id)
-                else:
-                    self.non_choice_courses -= course.points
-                self.total_points -= course.points
-                self.category_counter[course.category] -= course.points
-                self.courses.pop(c)
-                self.update_avg()
-                self.update_sd()
-                return
+            self.root.withdraw()
 
-    def update_avg(self):
-        """updates the average"""
-        try:
-            self.avg = self.total_relative_grades / self.points_without_binary
-        except ZeroDivisionError:
-            return 0
-
-    def update_sd(self):
-        """updates the standard deviation"""
-        numerator = 0
-        for c in self.courses:
-            if not self.courses[c]:
-                numerator += c.points * ((c.grade - self.avg) ** 2)
-        try:
-            self.sd = (numerator / self.points_without_binary) ** 0.5
-        except ZeroDivisionError:
-            return 0
-
-    def __str__(self):
-        returned_str = 'id\tpts\tgrade\tname\n'
-        if not self.courses:
-            return str()
-        for c in self.courses:
-            returned_str += f'{c.id}\t{str(c.points)}\t{str(c.grade)}\t{c.name}\n'
-        return returned_str
-
-    def avg_calc(self, id_lst):
-        """calculates the average of a given list of courses (their id)"""
-        points_sum, grades_sum = 0, 0
-        for id in id_lst:
-            for course in self.courses:
-                if course.id == id and not self.courses[course]:
-                    points_sum += course.points
-                    grades_sum += course.relative_grade
-        if not points_sum:
-            return 0
-        return grades_sum/points_sum
-
-    def sum_points(self, id_lst):
-        """calculates the sum of points of a given list of courses (their id)"""
-        sum_points = 0
-        for course in self.courses:
-            if course.id in id_lst:
-                sum_points += course.points
-        return sum_points
-
-    def best_avg(self):
-        """creates a list of the best combinations of courses to yield a given amount of points"""
-        if not self.final_points_amount:
+    def show(self, courses: Courses):
+        """shows the window with the plot of the courses, unless there is nothing to plot"""
+        if not self.plot.update(courses):
             return
-        results = []
-        ids = self.choice_courses
-        for i in range(len(ids)):
-            results.extend(
-                    [(combo, self.avg_calc(combo)) for combo in combinations(ids, i)
-                     if self.sum_points(combo) == self.final_points_amount])
-        if not results:
-            only_combination = tuple([id for id in self.choice_courses])
-            results.append((only_combination, self.avg_calc(only_combination)))
-            return results
-        results.sort(key=lambda z: z[1])
-        return list(reversed(results))
-
-    def get_avg(self):
-        """returns the standard average"""
-        return round(self.avg, 3)
-
-    def get_sd(self):
-        """returns the standard deviation"""
-        return round(self.sd, 3)
-
-    def copy(self):
-        """creates a copy of the object"""
-        new_object = Courses()
-        for course in self.courses:
-            new_object.add_course(course)
-        return new_object
+        self.canvas.draw_idle()
+        self.root.deiconify()
+        self.root.state('zoomed')
+        self.root.lift()
 
 
 class EditWindow:
-    """window that handles the editing of data"""
+    """window that handles the editing of data. the edits are kept in an EditSession and only reach the courses of
+    the main window when saved"""
     def __init__(self, root, courses, grades):
-        self.courses = courses.copy()
+        self.courses = courses.edit()
         self.grades_object = grades
         self.courses_original = courses
         self.root = root
@@ -219,7 +210,9 @@ class EditWindow:
         self.button_quit = tk.Button(
             self.root, text='Save and quit editing', fg='white', bg='blue', width=30, height=4,
             activebackground='blue', relief='raised', command=self.save_quit, state='normal', font=fnt.Font(size=20))
-        self.label_board = tk.Label(self.root, text='', bg="cyan", justify='left', width=80, height=45, )
+        self.table = CourseTable(self.root, height=40)
+        self.label_preview = tk.Label(self.root, text='', font=('Verdana', 14), justify='left', width=52, height=3,
+                                      fg='white', bg='black')
 
         index = 0
         for i in range(len(self.entries)):
@@ -231,17 +224,43 @@ class EditWindow:
         self.entry_remove.grid(row=6, column=2, padx=5, pady=2)
         self.button_remove.grid(row=7, column=2, padx=5, pady=2, columnspan=1)
         self.button_quit.grid(row=7, column=3, padx=5, pady=2)
-        self.label_board.grid(row=0, column=3, padx=5, pady=2, rowspan=7)
-        self.update_board()
+        self.table.grid(row=0, column=3, padx=5, pady=2, rowspan=7)
+        self.label_preview.grid(row=8, column=2, padx=5, pady=2)
+        for entry in self.entries + [self.entry_remove]:
+            entry.bind('<KeyRelease>', self.preview)
+        self.table.sync(self.courses_original)
+        self.preview()
 
     def quit(self):
         """quits the editing window"""
         if not messagebox.askokcancel("Quit", "Quit without saving?"):
+            self.courses.discard()
             self.grades_object.cont()
             self.root.destroy()
 
-    def update_board(self):
-        self.label_board['text'] = str(self.courses)
+    def typed_course(self):
+        """returns the course typed in the entries so far, or None if its id, points or grade are not valid yet"""
+        id, name, points, grade, category = [entry.get() for entry in self.entries]
+        try:
+            points = float(points)
+            if grade != 'pass':
+                grade = float(grade)
+                if not MIN_GRADE <= grade <= MAX_GRADE:
+                    return
+        except ValueError:
+            return
+        if not id or not 0 < points < math.inf:
+            return
+        return Course(id, name, points, grade, category)
+
+    def preview(self, event=None):
+        """shows the average and the standard deviation there would be after adding the typed course and removing
+        the typed course id, while typing"""
+        avg, sd = self.courses.get_avg(), self.courses.get_sd()
+        removed_id = self.entry_remove.get() or None
+        new_avg, new_sd = self.courses.what_if(self.typed_course(), removed_id)
+        self.label_preview['text'] = f'average: {round(new_avg, 3)} ({round(new_avg - avg, 3):+})\n' \
+                                     f'SD: {round(new_sd, 3)} ({round(new_sd - sd, 3):+})'
 
     def add_course(self):
         """add a new course"""
@@ -251,16 +270,12 @@ class EditWindow:
             entry.configure(bg='gray')
             course_data.append(self.check_entry(entry))
         if all(course_data):
-            duplicate = None
-            for course in self.courses.courses:
-                if course.id == course_data[0]:
-                    duplicate = course
-            if duplicate:
-                self.courses.remove_course(duplicate)
-            self.courses.add_course(Course(*course_data))
+            course = Course(*course_data)
+            self.courses.add_course(course)  # replaces the course with the same id
+            self.table.insert(course)
             for entry in self.entries:
                 entry.delete(0, 'end')
-            self.update_board()
+            self.preview()
 
     def check_entry(self, entry):
         """check that the entry is filled with the appropriate data"""
@@ -272,7 +287,7 @@ class EditWindow:
                 return entry.get()
             try:
                 grade = float(entry.get())
-                if grade < MIN_GRADE or grade > MAX_GRADE:
+                if not MIN_GRADE <= grade <= MAX_GRADE:
                     entry.configure(bg='pink')
                     return
                 else:
@@ -283,7 +298,7 @@ class EditWindow:
         if entry is self.entry_points:
             try:
                 points = float(entry.get())
-                if points > 0:
+                if 0 < points < math.inf:
                     return points
                 entry.configure(bg='pink')
                 return
@@ -302,19 +317,20 @@ class EditWindow:
         if not entry_input:
             self.entry_remove.configure(bg='pink')
             return
-        for course in self.courses.courses:
-            if entry_input == course.id:
-                self.courses.remove_course(course)
-                self.entry_remove.delete(0, 'end')
-                self.update_board()
-                return
+        course = self.courses.course_of(entry_input)
+        if course is not None:
+            self.courses.remove_course(course)
+            self.table.delete(entry_input)
+            self.entry_remove.delete(0, 'end')
+            self.preview()
+            return
         self.entry_remove.configure(bg='pink')
 
     def save_quit(self):
         """transfers the edited grades to the main window and quits the editing window"""
         if messagebox.askyesno("Quit", "Do you wish to save and quit?"):
-            self.courses_original.courses = self.courses.courses
-            self.grades_object.cont()
+            self.courses.commit()
+            self.grades_object.cont(edited=True)
             self.root.destroy()
 
 
@@ -326,12 +342,18 @@ class Grades:
         self.root.state('zoomed')
         root.protocol("WM_DELETE_WINDOW", self.quit_attempt)
         self.name = ''
-        self.best_avg_iter = None
-        self.best_avg_list = None
-        self.current_chart = None
+        self.search = None  # (thread, results queue, progress) of the running best average search
+        self.found = []  # combinations found by the search and not shown yet
+        self.pending = 0  # combinations the user asked for that weren't found yet
+        self.plot_windows = {}  # plot kind -> PlotWindow, kept once opened
         self.filename = None
-        self.saved = True
         self.courses = Courses()
+        self.transcripts = {}  # filename -> Courses of every opened file, in the order they were opened
+        self.loading = []  # (filename, progress, future) of the files being read in background threads
+        self.saver = ThreadPoolExecutor(1)  # writes the changes of the opened files, one file after the other
+        self.saving = []  # (filename, future, announced) of the files being written by the saver
+        self.editing = False  # whether the editing window is open, its edits are applied to the courses once saved
+        self.closing = False  # whether the window is closed once the files being written are saved
 
         # widgets:
         self.open_file_button = tk.Button(
@@ -350,8 +372,7 @@ class Grades:
             self.root, text='save changes', fg='black', bg='lightblue', width=20, height=4,
             activebackground='blue', relief='raised', command=self.save_grades, state='normal', font=fnt.Font(size=20)
         )
-        self.board_label = tk.Label(self.root, text='', bg='khaki1',
-                                    justify='left', width=70, height=52, relief='groove')
+        self.table = CourseTable(self.root, height=45)
 
         self.entry = tk.Entry(self.root, cursor='xterm', width=13, bg='white', bd=5, font=('Verdana', 25))
         self.entry.insert(-1, DEFAULT_TEXT)
@@ -360,6 +381,10 @@ class Grades:
             self.root, text='plot\ngrades per course', fg='black', bg='DeepSkyBlue2', width=20, height=2,
             activebackground='blue', relief='raised', command=self.plot_grades, state='normal', font=fnt.Font(size=20)
         )
+        self.sweep_button = tk.Button(
+            self.root, text='plot\nbest average by points', fg='black', bg='DeepSkyBlue2', width=20, height=2,
+            activebackground='blue', relief='raised', command=self.plot_sweep, state='normal', font=fnt.Font(size=20)
+        )
         self.histogram_button = tk.Button(
             self.root, text='plot\ngrades histogram', fg='black', bg='DeepSkyBlue2', width=20, height=2,
             activebackground='blue', relief='raised', command=self.histogram, state='normal', font=fnt.Font(size=20)
@@ -389,25 +414,41 @@ class Grades:
             self.root, text='save best options', fg='black', bg='SeaGreen1', width=20, height=2, font=fnt.Font(size=20),
             activebackground='blue', relief='raised', command=self.save_best_options, state='normal'
         )
+        self.cancel_button = tk.Button(
+            self.root, text='cancel', fg='black', bg='salmon', width=10, height=2, font=fnt.Font(size=20),
+            activebackground='blue', relief='raised', command=self.cancel_search, state='disabled'
+        )
+        self.progress_label = tk.Label(self.root, text='', bg='aquamarine2', justify='left', width=24, height=4,
+                                       relief='groove')
+        self.files_box = ttk.Combobox(self.root, state='disabled', width=30, font=('Verdana', 14))
+        self.files_box.bind('<<ComboboxSelected>>', self.select_transcript)
+        self.load_bar = ttk.Progressbar(self.root, orient='horizontal', length=400, mode='determinate', maximum=100)
 
         # functional placements:
         self.open_file_button.grid(column=1, row=1, rowspan=2, padx=5, pady=1)
         self.new_file_button.grid(column=1, row=3, rowspan=2, padx=5, pady=1)
         self.edit_button.grid(column=1, row=5, rowspan=2, padx=5, pady=1)
         self.save_grades_button.grid(column=1, row=7, rowspan=2, padx=5, pady=1)
-        self.board_label.grid(column=2, row=1, rowspan=8, padx=5, pady=1)
+        self.table.grid(column=2, row=1, rowspan=8, padx=5, pady=1)
         self.entry.grid(column=3, row=1, rowspan=1, padx=5, pady=1)
         self.plot_button.grid(column=3, row=2, rowspan=1, padx=5, pady=1)
-        self.histogram_button.grid(column=3, row=3, rowspan=1, padx=5, pady=1)
-        self.piechart_button.grid(column=3, row=4, rowspan=1, padx=5, pady=1)
-        self.show_characteristics_button.grid(column=3, row=5, rowspan=1, padx=5, pady=1)
-        self.characteristics_label.grid(column=3, row=6, rowspan=3, padx=5, pady=1)
+        self.sweep_button.grid(column=3, row=3, rowspan=1, padx=5, pady=1)
+        self.histogram_button.grid(column=3, row=4, rowspan=1, padx=5, pady=1)
+        self.piechart_button.grid(column=3, row=5, rowspan=1, padx=5, pady=1)
+        self.show_characteristics_button.grid(column=3, row=6, rowspan=1, padx=5, pady=1)
+        self.characteristics_label.grid(column=3, row=7, rowspan=2, padx=5, pady=1)
         self.best_avg_button.grid(column=4, row=1, rowspan=1, padx=5, pady=1)
         self.next_button.grid(column=4, row=2, rowspan=1, padx=5, pady=1)
         self.best_avg_label.grid(column=4, row=3, rowspan=5, padx=5, pady=1)
         self.save_best_options_button.grid(column=4, row=8, rowspan=1, padx=5, pady=1)
+        self.cancel_button.grid(column=5, row=1, rowspan=1, padx=5, pady=1)
+        self.progress_label.grid(column=5, row=2, rowspan=1, padx=5, pady=1)
+        self.files_box.grid(column=1, row=9, rowspan=1, padx=5, pady=1)
+        self.load_bar.grid(column=2, row=9, rowspan=1, padx=5, pady=1)
+        self.load_bar.grid_remove()  # only shown while files are being read
 
         self.update_state()  # disabling the relevant buttons
+        self.root.after(AUTOSAVE_MS, self.autosave)
 
     def update_state(self):
         """updates which buttons are disabled and window title"""
@@ -417,53 +458,130 @@ class Grades:
             name = name[:-4]  # deletes the ".csv"
             self.root.title(f'Grades manipulator - {name}')
             self.name = name
+        elif self.transcripts:  # all the opened files together
+            self.root.title(f'Grades manipulator - {MERGED}')
+            self.name = 'merged'
         for widget in [self.open_file_button, self.entry, self.new_file_button, self.save_grades_button,
                        self.show_characteristics_button, self.next_button, self.best_avg_button]:
             widget.configure(state='normal')
+        self.files_box.configure(state='readonly' if self.transcripts else 'disabled')
         if self.best_avg_label['text']:
             self.save_best_options_button.configure(state='normal')
         self.edit_button.configure(state='normal') if self.filename else self.edit_button.configure(state='disabled')
         if not self.courses.courses:
-            for widget in [self.plot_button, self.save_best_options_button, self.histogram_button, self.piechart_button]:
+            for widget in [self.plot_button, self.save_best_options_button, self.histogram_button, self.piechart_button,
+                           self.sweep_button]:
                 widget.configure(state='disabled')
         else:
             for widget in [self.plot_button, self.save_best_options_button, self.histogram_button, self.piechart_button,
-                           self.edit_button]:
+                           self.sweep_button]:
                 widget.configure(state='normal')
+        self.cancel_button.configure(state='normal' if self.search else 'disabled')
+        if self.loading:  # the shown courses are replaced once the files are read
+            for widget in [self.open_file_button, self.edit_button]:
+                widget.configure(state='disabled')
+        if self.saving:  # the courses are not edited while the saver reads them
+            self.edit_button.configure(state='disabled')
 
     def open_file(self):
-        """opens a CSV file"""
+        """opens CSV or binary transcript files. the files are read in background threads, LOAD_WORKERS at a time,
+        while a progress bar shows how much of them was read. files that are already open are not read again"""
         while True:
-            filename = fd.askopenfilename(filetypes=[("CSV file", "*.csv")],
-                                          initialdir=os.path.abspath(os.getcwd())+'\\files')
-            if not filename:
+            filenames = fd.askopenfilenames(filetypes=[("CSV file", "*.csv"), ("Binary transcript", "*.npy")],
+                                            initialdir=os.path.abspath(os.getcwd())+'\\files')
+            if not filenames:
                 return
-            if filename.endswith('.csv'):
+            filenames = [filename for filename in filenames if filename.endswith(TRANSCRIPT_EXTENSIONS)]
+            if filenames:
                 break
+        opened = [filename for filename in filenames if filename in self.transcripts]
+        if opened and len(opened) == len(filenames):
+            self.show_transcript(opened[0])
+            return
+        executor = ThreadPoolExecutor(LOAD_WORKERS)
+        for filename in filenames:
+            if filename not in self.transcripts:
+                progress = LoadProgress()
+                self.loading.append((filename, progress, executor.submit(load_courses, filename, None, progress)))
+        executor.shutdown(wait=False)  # the threads end once the files are read
+        self.update_state()
+        self.load_bar['value'] = 0
+        self.load_bar.grid()
+        self.root.after(POLL_MS, self.poll_loading)
+
+    def poll_loading(self):
+        """moves the progress bar of the files being read until all of them are read, then shows the first of them
+        along with the lines that were skipped and the files that could not be read"""
+        size = sum(progress.size for _, progress, _ in self.loading)
+        read = sum(progress.read for _, progress, _ in self.loading)
+        self.load_bar['value'] = 100 * read / size if size else 0
+        if not all(future.done() for _, _, future in self.loading):
+            self.root.after(POLL_MS, self.poll_loading)
+            return
+        loading, self.loading = self.loading, []
+        self.load_bar.grid_remove()
+        skipped, failed, shown = [], [], None
+        for filename, _, future in loading:
+            name = os.path.basename(filename)
+            try:
+                courses, errors = future.result()
+            except (OSError, ValueError) as error:
+                failed.append(f'{name}: {error}')
+                continue
+            self.transcripts[filename] = courses
+            shown = shown or filename
+            if errors:
+                skipped.append(f'{name}: {len(errors)} lines were skipped')
+                skipped += [f'line {line}: {reason}' for line, reason in errors[:SHOWN_ERRORS]]
+        if failed:
+            messagebox.showerror(title='Unreadable files', message='\n'.join(failed))
+        if skipped:
+            messagebox.showwarning(title='Malformed lines', message='\n'.join(skipped))
+        self.update_files_box()
+        if shown:
+            self.show_transcript(shown)
+        else:
+            self.update_state()
+
+    def update_files_box(self):
+        """lists the opened files in the files list, and their merged courses if there are several"""
+        names = [os.path.basename(filename) for filename in self.transcripts]
+        self.files_box['values'] = names + [MERGED] if len(names) > 1 else names
+
+    def select_transcript(self, event=None):
+        """shows the transcript chosen in the files list"""
+        index = self.files_box.current()
+        filenames = list(self.transcripts)
+        self.show_transcript(filenames[index] if index < len(filenames) else None)
+
+    def show_transcript(self, filename):
+        """shows an opened transcript, or the courses of all the opened files together if filename is None. the
+        unsaved changes of the transcript shown so far are kept with its courses until they are saved"""
+        self.forget_search()
+        if filename is None:  # the merged courses are only viewed, the edit button stays disabled without a file
+            self.courses = Courses()
+            for courses in self.transcripts.values():
+                self.courses.add_courses(courses.courses)
+            self.files_box.current(len(self.transcripts))
+        else:
+            self.courses = self.transcripts[filename]
+            self.files_box.current(list(self.transcripts).index(filename))
         self.filename = filename
-        with open(filename, 'r') as file:
-            for line in file:
-                attributes = line.strip().split(',')  # id, name, points, grade, category
-                attributes[2] = float(attributes[2])
-                try:
-                    attributes[3] = float(attributes[3])
-                except ValueError:
-                    pass
-                course = Course(*attributes)
-                self.courses.add_course(course)
-        self.saved = True
         self.characteristics_label['text'] = ''
         self.best_avg_label['text'] = ''
         self.update_board()
         self.update_state()
 
     def update_board(self):
-        """updates the board_label (courses table)"""
-        self.board_label['text'] = str(self.courses)
+        """updates the courses table and the open plots to the current courses"""
+        self.table.sync(self.courses)
+        for plot_window in self.plot_windows.values():
+            plot_window.refresh(self.courses)
 
     def edit_grades(self):
         """opens new window with editing options (remove or add courses)"""
-        self.saved = False
+        self.cancel_search()
+        self.editing = True
         edit_win = tk.Toplevel(self.root)
         EditWindow(edit_win, self.courses, self)
         self.disable_all()
@@ -472,20 +590,21 @@ class Grades:
         """disables all buttons and entries"""
         widgets = [self.best_avg_button, self.plot_button, self.next_button, self.edit_button, self.piechart_button,
                    self.save_grades_button, self.open_file_button, self.new_file_button, self.histogram_button,
-                   self.show_characteristics_button, self.save_best_options_button, self.entry]
+                   self.show_characteristics_button, self.save_best_options_button, self.entry, self.cancel_button,
+                   self.sweep_button, self.files_box]
         for widget in widgets:
             widget.configure(state='disabled')
 
-    def cont(self):
-        """handles the isntance in which the user saved and closed the editing window"""
+    def cont(self, edited: bool = False):
+        """handles the isntance in which the user closed the editing window, with its changes saved if edited"""
+        self.editing = False
+        if edited:
+            self.forget_search()
         self.update_state()
         self.update_board()
 
     def new_grades_file(self):
-        """creates a new CSV file"""
-        if not self.saved:
-            if not messagebox.askokcancel("New file", "Create new file?\nPrevious file will not be saved!"):
-                return
+        """creates a new CSV file. the changes of the opened files are kept until they are saved"""
         filename = fd.asksaveasfilename(
             filetypes=[("CSV file", "*.csv")], defaultextension='.csv',
             initialdir=os.path.abspath(os.getcwd()) + '\\files', title="Choose filename")
@@ -493,86 +612,91 @@ class Grades:
             return
         if not filename.endswith('.csv'):
             filename += '.csv'
-        self.saved = True
+        self.forget_search()
         self.filename = filename
         self.characteristics_label['text'] = ''
         self.best_avg_label['text'] = ''
         self.courses = Courses()
+        self.transcripts[filename] = self.courses
+        self.update_files_box()
+        self.files_box.current(list(self.transcripts).index(filename))
         self.update_board()
         self.update_state()
 
-    def save_grades(self):
-        """writes the current data to the opened file"""
-        if not self.courses.courses:
+    def unsaved(self):
+        """returns the opened files with changes that were not saved yet"""
+        return [filename for filename, courses in self.transcripts.items() if courses.changed]
+
+    def save_files(self, filenames, announced: bool = False):
+        """writes the changes of opened files in the saver's thread, so the window doesn't wait for the disk. the
+        courses are not edited until they are written, and the window tells once they are if announced"""
+        if not filenames:
             return
-        if not self.saved:
-            courses_str = [str(course) for course in self.courses.courses]
-            with open(self.filename, 'w') as file:
-                file.write('\n'.join(courses_str))
-            self.saved = True
+        polling = bool(self.saving)
+        for filename in filenames:  # only the changed courses, unless the file is compacted
+            self.saving.append((filename, self.saver.submit(save_changes, self.transcripts[filename], filename),
+                                announced))
+        self.update_state()
+        if not polling:
+            self.root.after(POLL_MS, self.poll_saving)
+
+    def poll_saving(self):
+        """waits for the files being written, then shows the files that could not be written, whose changes are kept
+        to be saved again, and closes the window if it was closed meanwhile"""
+        if not all(future.done() for _, future, _ in self.saving):
+            self.root.after(POLL_MS, self.poll_saving)
+            return
+        saving, self.saving = self.saving, []
+        failed = []
+        for filename, future, _ in saving:
+            try:
+                future.result()
+            except OSError as error:
+                failed.append(f'{os.path.basename(filename)}: {error}')
+        if failed:
+            self.closing = False
+            messagebox.showerror(title='Unsaved files', message='\n'.join(failed))
+        elif self.closing:
+            self.root.destroy()
+            return
+        elif any(announced for _, _, announced in saving):
             messagebox.showinfo(title='', message='File has been saved')
+        self.update_state()
+
+    def save_grades(self):
+        """writes the changes of the shown file to it"""
+        if self.filename and self.courses.changed:
+            self.save_files([self.filename], announced=True)
+
+    def autosave(self):
+        """saves the changes of the opened files, every AUTOSAVE_MS, unless they are being edited or saved"""
+        if not self.editing and not self.saving:
+            self.save_files(self.unsaved())
+        self.root.after(AUTOSAVE_MS, self.autosave)
+
+    def show_plot(self, kind: str, title: str, icon: str):
+        """shows a plot of the courses in its own window. the window and its figure are created on the first click
+        and kept, later clicks only redraw what changed"""
+        if kind not in self.plot_windows:
+            import plots  # matplotlib is loaded on the first plot, not at startup
+            self.plot_windows[kind] = PlotWindow(self.root, plots.PLOTS[kind](), title, icon)
+        self.plot_windows[kind].show(self.courses)
 
     def plot_grades(self):
-        """creates a bar-plot of the grades"""
-        plt.close('all')
-        data = []
-        for course in self.courses.courses:
-            if not self.courses.courses[course]:  # not binary grade
-                data.append((course.name, course.grade))
-        data.sort(key=lambda z: z[1])
-        names, grades = [], []
-        for i in data:
-            names.append(i[0])
-            grades.append(i[1])
-        if names:
-            plt.barh(names, grades)
-            plt.title("Courses Grades")
-            plt.xlabel("grade")
-            mng = plt.get_current_fig_manager()
-            mng.set_window_title('Courses by grade bar-plot')
-            mng.window.state('zoomed')
-            mng.window.wm_iconbitmap("support_files\\barplot.ico")
-            plt.subplots_adjust(left=0.33, top=0.93, right=0.9)
-            plt.show()
+        """shows a bar-plot of the grades"""
+        self.show_plot('grades', 'Courses by grade bar-plot', "support_files\\barplot.ico")
+
+    def plot_sweep(self):
+        """shows the best average that can be reached for every amount of choice points"""
+        self.show_plot('sweep', 'Best average by choice points', "support_files\\barplot.ico")
 
     def histogram(self):
-        """creates a histogram of the grades"""
-        plt.close('all')
-        grades, points = [], []
-        for course in self.courses.courses:
-            if not self.courses.courses[course]:  # not binary grade
-                grades.append(course.grade)
-                points.append(course.points)
-        bins = list(range(10, 101, 5))  # [10, 15, 20, ... , 95, 100]
-        if grades:
-            plt.hist(grades, weights=points, bins=bins, edgecolor="black", color="lightgreen", log=False)
-            plt.title("Grades Histogram")
-            plt.xlabel("grade")
-            plt.ylabel("points")
-            mng = plt.get_current_fig_manager()
-            mng.window.state('zoomed')
-            mng.set_window_title('Grades histogram')
-            mng.window.wm_iconbitmap("support_files\\histogram.ico")
-            plt.tight_layout()  # adjust plot spacing
-            plt.show()
+        """shows a histogram of the grades"""
+        self.show_plot('histogram', 'Grades histogram', "support_files\\histogram.ico")
 
     def piechart(self):
-        """creates a pie-chart of the courses categories"""
-        plt.close('all')
-        categories, count = [], []
-        colors = ['#008fd5', '#fc4f30', '#e5ae37', '#6d904f', 'mediumorchid', 'chocolate', 'grey', 'aqua']
-        categories = self.courses.category_counter.keys()
-        count = self.courses.category_counter.values()
-        if categories:
-            plt.pie(count, labels=categories, wedgeprops={'edgecolor': 'black'}, colors=colors, shadow=True,
-                    startangle=90, autopct=lambda p: f'{p * sum(count) / 100 :.0f}')
-            plt.title("Courses Categories")
-            mng = plt.get_current_fig_manager()
-            mng.window.state('zoomed')
-            mng.set_window_title('Course categories pie-chart')
-            mng.window.wm_iconbitmap("support_files\\pie_chart.ico")
-            plt.tight_layout()  # adjust plot spacing
-            plt.show()
+        """shows a pie-chart of the courses categories"""
+        self.show_plot('categories', 'Course categories pie-chart', "support_files\\pie_chart.ico")
 
     def show_characteristics(self):
         """displays general characteristics of the grades and points (avg, sd...)"""
@@ -582,63 +706,129 @@ class Grades:
             f'Average:\t\t{self.courses.get_avg()}\nSD:\t\t{self.courses.get_sd()}'
 
     def best_avg(self):
-        """creates an iterator that contains the best choices for the highest average based on amount of points in
-        the entry"""
+        """starts searching, in a background thread, for the best choices for the highest average based on amount
+        of points in the entry ('20' for exactly 20 points, '20+' for the fewest points of at least 20, '20+-1' or
+        '20±1' for 20 points give or take 1), and shows the first one when it is found"""
         self.best_avg_label['text'] = ''
-        amount = self.entry.get()
         try:
-            amount = int(amount)
+            target = parse_points_target(self.entry.get())
             self.entry.configure(bg='white')
         except ValueError:
             self.entry.configure(bg='pink')
             return
-        self.courses.set_final_points_amount(amount)
-        self.best_avg_list = self.courses.best_avg()
-        self.best_avg_iter = iter(self.best_avg_list)
+        self.cancel_search()
+        self.courses.set_final_points_amount(*target)
+        self.found, self.pending = [], 0
+        progress, results = SearchProgress(), queue.Queue()
+        thread = threading.Thread(target=search_worker, daemon=True,
+                                  args=(self.courses.ranked_combinations(SAVED_OPTIONS, progress), results))
+        self.search = thread, results, progress
+        thread.start()
+        self.cancel_button.configure(state='normal')
         self.update_best_avg_label()
+        self.root.after(POLL_MS, self.poll_search)
+
+    def poll_search(self):
+        """collects the combinations found by the background search and shows its progress, until it is over"""
+        if not self.search:
+            return
+        thread, results, progress = self.search
+        finished = False
+        while not results.empty():
+            combination = results.get()
+            if combination is None:
+                finished = True
+            else:
+                self.found.append(combination)
+        self.show_found()
+        best = round(progress.best, 3) if progress.best is not None else '-'
+        self.progress_label['text'] = f'subsets evaluated: {progress.evaluated}\nbest average so far: {best}'
+        if finished:
+            self.progress_label['text'] += '\nsearch finished'
+            if not self.best_avg_label['text'] and not self.found:
+                self.best_avg_label['text'] = f'no combination of choice courses\nmatches {self.entry.get()} points'
+            self.search = None
+            self.cancel_button.configure(state='disabled')
+        else:
+            self.root.after(POLL_MS, self.poll_search)
+
+    def cancel_search(self):
+        """stops the background search, keeping the combinations found so far"""
+        if not self.search:
+            return
+        self.search[2].cancel()
+        self.search = None
+        self.pending = 0
+        self.cancel_button.configure(state='disabled')
+        self.progress_label['text'] += '\nsearch cancelled'
+
+    def forget_search(self):
+        """stops the background search and drops the combinations it found, once the shown courses change"""
+        self.cancel_search()
+        self.found = []
+        self.best_avg_label['text'] = ''
 
     def update_best_avg_label(self):
-        """shows the next best choice of highest average"""
-        label = str()
-        try:
-            courses, avg = next(self.best_avg_iter)
+        """shows the next best choice of highest average, as soon as the search finds it"""
+        self.pending += 1
+        self.show_found()
+        self.save_best_options_button.configure(state='normal')
+
+    def show_found(self):
+        """adds the combinations the user asked for to best_avg_label, as far as they were found"""
+        while self.pending and self.found:
+            courses, avg = self.found.pop(0)
+            self.pending -= 1
+            label = str()
             avg = round(avg, 3)
-            for course in self.courses.courses:
-                for id in courses:
-                    if course.id == id:
-                        label += f'- {course.name}\n'
+            for id in courses:
+                label += f'- {self.courses.name_of(id)}\n'
             if avg:
                 label += f'average: {avg}\n\n'
             self.best_avg_label['text'] += label
-        except StopIteration:
-            pass
-        self.save_best_options_button.configure(state='normal')
+        if not self.search:  # nothing more is coming
+            self.pending = 0
 
     def save_best_options(self):
-        """saves the best combinations of courses with the highest average to a txt file"""
-        if not self.courses.courses:
+        """saves the best combinations of courses with the highest average to a txt file (the first SAVED_OPTIONS
+        of them) in a background thread, over a copy of the courses so they can be edited in the meantime"""
+        if not self.courses.courses or not self.courses.final_points_amount:
             return
-        with open(f'files\\{self.name}_best_options.txt', 'w') as file:
-            for courses, avg in self.best_avg_list:
-                file.write(str(avg) + ': ')
-                for id in courses:
-                    for course in self.courses.courses:
-                        if course.id == id:
-                            file.write(course.name)
-                            if id != courses[-1]:
-                                file.write(', ')
-                file.write('\n')
+        courses = self.courses.copy()
+        courses.set_final_points_amount(self.courses.final_points_amount, self.courses.points_match,
+                                        self.courses.points_tolerance)
+        threading.Thread(target=best_options_worker, args=(courses, f'files\\{self.name}_best_options.txt')).start()
 
     def quit_attempt(self):
-        """handles the closing of the program"""
-        if not self.saved:
-            if messagebox.askokcancel("Quit", "Quit without saving?"):
-                self.root.destroy()
-        else:
-            self.root.destroy()
+        """handles the closing of the program. the changed files are saved first if the user wants them to be, and
+        the window is closed once they are written"""
+        if self.editing and not messagebox.askokcancel("Quit", "Quit without saving the edits?"):
+            return
+        unsaved = self.unsaved()
+        if unsaved:
+            names = '\n'.join(os.path.basename(filename) for filename in unsaved)
+            answer = messagebox.askyesnocancel("Quit", f"Save the changes of these files?\n{names}")
+            if answer is None:
+                return
+            if answer:
+                self.cancel_search()
+                self.closing = True
+                self.save_files(unsaved)
+                return
+        self.cancel_search()
+        self.root.destroy()
+
 
+profiling.instrument(CourseTable, ['insert', 'delete', 'sync', 'sort'])
+profiling.instrument(PlotWindow, ['refresh', 'show'])
+profiling.instrument(EditWindow, ['preview', 'add_course', 'remove_course', 'save_quit'])
+profiling.instrument(Grades, ['open_file', 'update_board', 'save_grades', 'autosave', 'plot_grades', 'histogram',
+                              'piechart', 'plot_sweep', 'show_characteristics', 'best_avg', 'poll_search', 'show_found',
+                              'save_best_options', 'poll_loading', 'show_transcript', 'poll_saving'])
 
 if __name__ == "__main__":
+    if len(sys.argv) == 3 and sys.argv[1] == '--profile':  # writes the timers of the session to the given file
+        profiling.enable(sys.argv[2])
     window = tk.Tk()
     Grades(window)
     window.mainloop()
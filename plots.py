@@ -0,0 +1,194 @@
+"""the grade plots, drawn on matplotlib figures that are kept between draws and updated in place, without pyplot so
+they work in the GUI and headless"""
+import numpy as np
+from matplotlib.figure import Figure
+
+
+HISTOGRAM_BINS = np.arange(10, 101, 5)  # [10, 15, 20, ... , 95, 100]
+PIE_COLORS = ['#008fd5', '#fc4f30', '#e5ae37', '#6d904f', 'mediumorchid', 'chocolate', 'grey', 'aqua']
+PIE_START_ANGLE = 90
+LABEL_DISTANCE = 1.1  # pie labels and amounts, relative to the radius (the defaults of Axes.pie)
+AMOUNT_DISTANCE = 0.6
+FIGURE_SIZE = (12, 8)  # inches
+PLOT_FORMATS = ('png', 'svg')
+
+
+class Plot:
+    """a figure that draws some data of the courses. the data is collected on every update, and the figure is only
+    redrawn when it changed"""
+    def __init__(self):
+        self.figure = Figure(figsize=FIGURE_SIZE)
+        self.axes = self.figure.add_subplot()
+        self.shown = None  # data drawn on the figure
+
+    def data(self, courses):
+        """returns the data to draw, or None if there is nothing to draw"""
+        raise NotImplementedError
+
+    def draw(self, data):
+        """draws the data, changing the existing artists where possible"""
+        raise NotImplementedError
+
+    def update(self, courses):
+        """draws the data of the courses if it changed since the last draw. returns whether there is data"""
+        data = self.data(courses)
+        if data is None:
+            return False
+        if data != self.shown:
+            self.draw(data)
+            self.shown = data
+        return True
+
+    def save(self, filename: str):
+        """writes the figure to an image file, in the format of the extension"""
+        self.figure.savefig(filename)
+
+
+class BarPlot(Plot):
+    """bar-plot of the grades per course, sorted by grade"""
+    def __init__(self):
+        super().__init__()
+        self.bars = None
+        self.figure.subplots_adjust(left=0.33, top=0.93, right=0.9)
+
+    def data(self, courses):
+        names, grades, _ = courses.graded_courses()
+        if not names:
+            return None
+        order = sorted(range(len(grades)), key=grades.__getitem__)
+        return [names[i] for i in order], [grades[i] for i in order]
+
+    def draw(self, data):
+        names, grades = data
+        if self.bars is None or len(self.bars) != len(grades):
+            self.axes.clear()
+            self.bars = self.axes.barh(range(len(grades)), grades)
+            self.axes.set_title("Courses Grades")
+            self.axes.set_xlabel("grade")
+        else:
+            for bar, grade in zip(self.bars, grades):
+                bar.set_width(grade)
+        self.axes.set_yticks(range(len(names)), names)
+        self.axes.set_xlim(0, max(grades) * 1.05)
+
+
+class HistogramPlot(Plot):
+    """histogram of the grades, weighted by points"""
+    def __init__(self):
+        super().__init__()
+        self.bars = None
+
+    def data(self, courses):
+        _, grades, points = courses.graded_courses()
+        if not grades:
+            return None
+        return np.histogram(grades, bins=HISTOGRAM_BINS, weights=points)[0].tolist()
+
+    def draw(self, heights):
+        if self.bars is None:
+            self.bars = self.axes.bar(HISTOGRAM_BINS[:-1], heights, width=np.diff(HISTOGRAM_BINS), align='edge',
+                                      edgecolor="black", color="lightgreen")
+            self.axes.set_title("Grades Histogram")
+            self.axes.set_xlabel("grade")
+            self.axes.set_ylabel("points")
+            self.figure.tight_layout()  # adjust plot spacing
+            return
+        for bar, height in zip(self.bars, heights):
+            bar.set_height(height)
+        self.axes.relim()
+        self.axes.autoscale_view()
+
+
+class PiePlot(Plot):
+    """pie-chart of the points per course category"""
+    def __init__(self):
+        super().__init__()
+        self.wedges = None
+        self.labels = None
+        self.amounts = None
+
+    def data(self, courses):
+        categories = courses.category_counter
+        if not categories:
+            return None
+        return list(categories), list(categories.values())
+
+    def draw(self, data):
+        categories, points = data
+        if self.wedges is None or categories != [label.get_text() for label in self.labels]:
+            self.axes.clear()
+            self.wedges, self.labels, self.amounts = self.axes.pie(
+                points, labels=categories, wedgeprops={'edgecolor': 'black'}, colors=PIE_COLORS,
+                startangle=PIE_START_ANGLE, autopct=lambda p: f'{p * sum(points) / 100 :.0f}',
+                labeldistance=LABEL_DISTANCE, pctdistance=AMOUNT_DISTANCE)
+            self.axes.set_title("Courses Categories")
+            self.figure.tight_layout()  # adjust plot spacing
+            return
+        total, angle = sum(points), PIE_START_ANGLE
+        for wedge, label, amount, value in zip(self.wedges, self.labels, self.amounts, points):
+            theta = 360 * value / total
+            wedge.set_theta1(angle)
+            wedge.set_theta2(angle + theta)
+            middle = np.deg2rad(angle + theta / 2)
+            x, y = np.cos(middle), np.sin(middle)
+            label.set_position((LABEL_DISTANCE * x, LABEL_DISTANCE * y))
+            label.set_horizontalalignment('left' if x > 0 else 'right')
+            amount.set_position((AMOUNT_DISTANCE * x, AMOUNT_DISTANCE * y))
+            amount.set_text(f'{value:.0f}')
+            angle += theta
+
+
+class SweepPlot(Plot):
+    """the best average that can be reached for every amount of choice points (see Courses.best_avg_sweep)"""
+    def __init__(self):
+        super().__init__()
+        self.line = None
+        self.target = None  # marks final_points_amount
+
+    def data(self, courses):
+        try:
+            sweep = courses.best_avg_sweep()
+        except ValueError:  # too many choice points
+            return None
+        sweep = [(points, avg) for points, avg, _ in sweep if avg]  # only binary grades: no average to show
+        if not sweep:
+            return None
+        points, averages = zip(*sweep)
+        return list(points), list(averages), courses.final_points_amount
+
+    def draw(self, data):
+        points, averages, target = data
+        if self.line is None:
+            self.line, = self.axes.plot(points, averages, marker='.', color='seagreen')
+            self.target = self.axes.axvline(0, color='salmon', linestyle='--')
+            self.axes.set_title("Best Average by Choice Points")
+            self.axes.set_xlabel("choice points")
+            self.axes.set_ylabel("best average")
+            self.axes.grid(True)
+            self.figure.tight_layout()  # adjust plot spacing
+        else:
+            self.line.set_data(points, averages)
+            self.axes.relim()
+            self.axes.autoscale_view()
+        self.target.set_xdata([target or 0] * 2)
+        self.target.set_visible(bool(target))
+
+
+PLOTS = {'grades': BarPlot, 'histogram': HistogramPlot, 'categories': PiePlot, 'sweep': SweepPlot}
+headless_plots = {}  # plots reused by render_plots, redrawn in place for every transcript
+
+
+def render_plots(courses, prefix: str, formats=PLOT_FORMATS):
+    """saves the plots of the courses to files named '<prefix>_<plot>.<format>', without a display. plots without
+    data are skipped. returns the filenames"""
+    filenames = []
+    for name, kind in PLOTS.items():
+        if name not in headless_plots:
+            headless_plots[name] = kind()
+        plot = headless_plots[name]
+        if not plot.update(courses):
+            continue
+        for format in formats:
+            filenames.append(f'{prefix}_{name}.{format}')
+            plot.save(filenames[-1])
+    return filenames
@@ -0,0 +1,121 @@
+"""timers and counters of the grade calculations and the GUI callbacks.
+off by default and free when off: the timed functions are only wrapped once enable() is called. setting the
+GRADES_PROFILE environment variable to a filename enables it on import and writes the report there at exit, as JSON,
+or as cProfile output if the filename ends with PROFILE_EXTENSION"""
+import atexit
+import json
+import os
+import sys
+import time
+from functools import wraps
+from types import ModuleType
+
+
+ENV_VAR = 'GRADES_PROFILE'
+PROFILE_EXTENSION = '.prof'  # reports with this extension are cProfile output, the others are JSON
+enabled = False
+timers = {}  # timer name -> [calls, seconds]
+counters = {}  # counter name -> amount
+registered = []  # (owner, attribute names) of the functions timed when enabled
+profiler = None  # the cProfile profiler, in cProfile mode
+
+
+def timer(name: str, function):
+    """wraps a function to add its calls and run time to the timer of that name"""
+    @wraps(function)
+    def timed(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            entry = timers.setdefault(name, [0, 0.0])
+            entry[0] += 1
+            entry[1] += time.perf_counter() - start
+    return timed
+
+
+def patch(owner, names):
+    """replaces the functions of a class or a module by timed ones. functions of a module are also replaced in the
+    modules that imported them by name"""
+    for name in names:
+        function = owner.__dict__[name]
+        timed = timer(f'{owner.__name__}.{name}', function)
+        setattr(owner, name, timed)
+        if isinstance(owner, ModuleType):
+            for module in list(sys.modules.values()):
+                if module is not None and vars(module).get(name) is function:
+                    setattr(module, name, timed)
+
+
+def instrument(owner, names):
+    """registers functions of a class or a module (by attribute name) to be timed once profiling is enabled.
+    only the attributes defined by the owner itself are patched, a subclass registers its own overrides"""
+    registered.append((owner, names))
+    if enabled and profiler is None:
+        patch(owner, names)
+
+
+def count(name: str, amount: int = 1):
+    """adds to a counter. call sites check `enabled` first, so counting costs nothing when profiling is off"""
+    counters[name] = counters.get(name, 0) + amount
+
+
+def enable(report_file=None):
+    """turns profiling on. with a report file, the report is written to it at exit. a report file ending with
+    PROFILE_EXTENSION runs cProfile over the whole process instead of the timers"""
+    global enabled, profiler
+    if enabled:
+        return
+    enabled = True
+    if report_file and report_file.endswith(PROFILE_EXTENSION):
+        import cProfile  # only needed in cProfile mode
+        profiler = cProfile.Profile()
+        profiler.enable()
+        atexit.register(profiler.dump_stats, report_file)
+        return
+    for owner, names in registered:
+        patch(owner, names)
+    if report_file:
+        atexit.register(write_report, report_file)
+
+
+def report():
+    """returns the timers and the counters"""
+    return {'timers': {name: {'calls': calls, 'seconds': seconds} for name, (calls, seconds) in sorted(timers.items())},
+            'counters': dict(sorted(counters.items()))}
+
+
+def take():
+    """returns the timers and the counters gathered so far and resets them, to be merged by another process"""
+    taken = {'timers': dict(timers), 'counters': dict(counters)}
+    timers.clear()
+    counters.clear()
+    return taken
+
+
+def merge(taken: dict):
+    """adds the timers and the counters returned by take() in another process"""
+    for name, (calls, seconds) in taken['timers'].items():
+        entry = timers.setdefault(name, [0, 0.0])
+        entry[0] += calls
+        entry[1] += seconds
+    for name, amount in taken['counters'].items():
+        count(name, amount)
+
+
+def write_report(filename: str):
+    """writes the report to a JSON file"""
+    with open(filename, 'w') as file:
+        json.dump(report(), file, indent=2)
+
+
+def print_report(file=sys.stderr):
+    """prints the timers, slowest first, and the counters"""
+    for name, (calls, seconds) in sorted(timers.items(), key=lambda z: -z[1][1]):
+        print(f'{name:<40}{calls:>10} calls {seconds:>10.4f}s', file=file)
+    for name, amount in sorted(counters.items()):
+        print(f'{name:<40}{amount:>10}', file=file)
+
+
+if os.environ.get(ENV_VAR):
+    enable(os.environ[ENV_VAR])